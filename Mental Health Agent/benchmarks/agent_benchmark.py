@@ -0,0 +1,123 @@
+"""
+End-to-end latency of MentalHealthAgent.run_agent under concurrent load.
+
+Turns run against a local fake Ollama server (benchmarks/fake_ollama.py) unless
+--ollama-url points at a real one, and the p50/p95/p99 of each turn stage
+(gather, search, adapt, format, generate, persist) and of whole turns are written
+as JSON, so runs can be diffed. search is part of gather and persist is part of
+generate (and of adapt, when it goes through the LLM). MySQL must be reachable
+as configured for the agent; memories are written to benchmark users' partitions.
+
+    python benchmarks/agent_benchmark.py --turns 200 --concurrency 8 --users 16 --token-rate 40
+    python benchmarks/agent_benchmark.py --ollama-url http://localhost:11434 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+# Adjust the import path as necessary
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama, add_arguments
+
+MESSAGES = (
+    "I had a rough day at work and I can't stop thinking about it.",
+    "I slept really badly again last night.",
+    "Today was actually pretty good, I went for a long walk.",
+    "I feel anxious about my exams next week.",
+    "My friend didn't reply to my messages and I feel ignored.",
+    "I'm not sure how I feel today, kind of flat.",
+)
+STAGES = ("gather", "search", "adapt", "format", "generate", "persist")
+
+def percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean": float(np.mean(values)), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(np.max(values))}
+
+def run(args) -> Dict[str, Any]:
+    fake = None
+    url = args.ollama_url
+    if url is None:
+        fake = FakeOllama(port=args.port, token_rate=args.token_rate, tokens=args.tokens, latency=args.latency,
+                          embed_latency=args.embed_latency, dimension=args.dimension).start()
+        url = fake.url
+    # Both the agent's client and the ollama library (embeddings) read these at import time
+    os.environ["AI_OLLAMA_BASE_URL"] = url
+    os.environ["AI_OLLAMA_HOSTS"] = url
+    os.environ["OLLAMA_HOST"] = url
+    os.environ["AI_OLLAMA_HEADLESS"] = "true"
+
+    from src.agents.simple_agent import MentalHealthAgent
+    from src.modules.turn_pipeline import turn_stats
+    from src.modules.ollama_client import default_client, generation_metrics, scheduler
+    from src.modules.kb_graph import db_pool, edge_buffer, neighbor_cache, graph_traversal
+
+    default_client.headless = True
+    agent = MentalHealthAgent()
+    users = [f"{args.user_prefix}-{i}" for i in range(args.users)]
+
+    def turn(i: int):
+        message = MESSAGES[i % len(MESSAGES)]
+        response = agent.run_agent(message, users[i % len(users)])
+        return response is not None and not response.startswith("Error")
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(turn, range(args.warmup)))
+        turn_stats.reset(window=args.turns)
+        started = time.perf_counter()
+        succeeded = list(pool.map(turn, range(args.turns)))
+        wall_seconds = time.perf_counter() - started
+
+    records = turn_stats.recent()
+    stages = {stage: percentiles([r["stages"][stage] for r in records if stage in r["stages"]]) for stage in STAGES}
+    summary = turn_stats.summary()
+    if fake is not None:
+        fake.stop()
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "ollama_url": url,
+        "turns": len(records),
+        "failed_turns": succeeded.count(False),
+        "wall_seconds": wall_seconds,
+        "turns_per_second": len(records) / wall_seconds if wall_seconds > 0 else 0.0,
+        "over_budget": summary["over_budget"],
+        "adapt_paths": summary["adapt_paths"],
+        "total": percentiles([r["total_seconds"] for r in records]),
+        "stages": stages,
+        "generation": generation_metrics.summary(),
+        "scheduler": scheduler.stats(),
+        "db_pool": db_pool.stats(),
+        "edge_buffer": edge_buffer.stats(),
+        "neighbor_cache": neighbor_cache.stats(),
+        "graph_traversal": graph_traversal.stats(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=4, help="turns run before measuring")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--user-prefix", default="benchmark")
+    parser.add_argument("--ollama-url", help="benchmark against this server instead of the fake one")
+    parser.add_argument("--port", type=int, default=0, help="port of the fake server (0 picks a free one)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    add_arguments(parser)
+    args = parser.parse_args()
+    text = json.dumps(run(args), indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
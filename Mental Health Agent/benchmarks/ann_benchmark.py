@@ -0,0 +1,91 @@
+"""
+Recall@k and QPS of the IVF memory index against exact find_most_similar.
+
+    python benchmarks/ann_benchmark.py --vectors 100000 --nlist 256 --nprobe 4 8 16 32
+    python benchmarks/ann_benchmark.py --store   # use the vectors in EMBEDDING_STORE_DIR
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Adjust the import path as necessary
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.modules.ann_index import IVFIndex
+from src.modules.vector_index import VectorIndex
+from src.modules.memory_search import find_most_similar
+from src.modules.embeddings import embedding_store
+
+def synthetic_vectors(count: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    """
+    Clustered Gaussian data, closer to real embedding distributions than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centers[labels] + 1.0 * rng.standard_normal((count, dimension)).astype(np.float32)
+
+def build_index(vectors: np.ndarray, ann: IVFIndex = None) -> VectorIndex:
+    index = VectorIndex(initial_capacity=len(vectors), ann=ann)
+    for i, vector in enumerate(vectors):
+        index.add(str(i), vector)
+    return index
+
+def run(args):
+    if args.store:
+        ids, vectors = embedding_store.load_all()
+        if not ids:
+            print(f"No vectors found in {embedding_store.directory}")
+            return
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimension, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    start = time.perf_counter()
+    truth = [{i for _, i in find_most_similar(query, vectors, args.k)} for query in queries]
+    exact_seconds = time.perf_counter() - start
+    print(f"{'index':<28}{'recall@' + str(args.k):>12}{'QPS':>12}{'build s':>10}")
+    print(f"{'find_most_similar':<28}{1.0:>12.4f}{len(queries) / exact_seconds:>12.1f}{0.0:>10.2f}")
+
+    start = time.perf_counter()
+    exact = build_index(vectors)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    hits = [exact.search(query, args.k) for query in queries]
+    seconds = time.perf_counter() - start
+    recall = np.mean([len({int(i) for _, i in h} & t) / args.k for h, t in zip(hits, truth)])
+    print(f"{'exact VectorIndex':<28}{recall:>12.4f}{len(queries) / seconds:>12.1f}{build_seconds:>10.2f}")
+
+    start = time.perf_counter()
+    ann = IVFIndex(nlist=args.nlist, nprobe=args.nprobe[0], seed=args.seed)
+    index = build_index(vectors, ann)
+    build_seconds = time.perf_counter() - start
+    for nprobe in args.nprobe:
+        ann.nprobe = nprobe
+        start = time.perf_counter()
+        hits = [index.search(query, args.k) for query in queries]
+        seconds = time.perf_counter() - start
+        recall = np.mean([len({int(i) for _, i in h} & t) / args.k for h, t in zip(hits, truth)])
+        label = f"ivf nlist={args.nlist} nprobe={nprobe}"
+        print(f"{label:<28}{recall:>12.4f}{len(queries) / seconds:>12.1f}{build_seconds:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", action="store_true", help="benchmark the vectors in the embedding store")
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
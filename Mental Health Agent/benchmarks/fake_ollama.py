@@ -0,0 +1,176 @@
+"""
+Stand-in for an Ollama server, for benchmarks and local runs without a model.
+
+Speaks the parts of the Ollama API the agent uses: /api/generate (streamed or
+not, returning context tokens), /api/embed, /api/embeddings and /api/tags.
+Generations wait --latency seconds before the first token, then emit --tokens
+tokens at --token-rate tokens per second; embeddings are deterministic per text.
+
+    python benchmarks/fake_ollama.py --port 11435 --token-rate 40 --latency 0.3
+    AI_OLLAMA_BASE_URL=http://localhost:11435 OLLAMA_HOST=http://localhost:11435 python main.py
+"""
+import json
+import time
+import zlib
+import argparse
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+WORDS = ("I", "hear", "you,", "and", "it", "sounds", "like", "today", "has", "been", "a", "lot.",
+         "What", "would", "help", "most", "right", "now?")
+
+class FakeOllama:
+    """
+    A threaded fake Ollama server; ``start()`` serves it in the background.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11435, token_rate: float = 50.0, tokens: int = 40,
+                 latency: float = 0.2, embed_latency: float = 0.01, dimension: int = 768,
+                 models: List[str] = ("gemma:2b", "nomic-embed-text")):
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.latency = latency
+        self.embed_latency = embed_latency
+        self.dimension = dimension
+        self.models = list(models)
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def embedding(self, text: str) -> List[float]:
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        vector = rng.standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def generate(self, body: Dict[str, Any]):
+        """
+        Yield the response chunks for one /api/generate request, pacing them like a real model.
+        """
+        prompt = body.get("prompt", "")
+        context = list(body.get("context") or [])
+        started = time.perf_counter()
+        time.sleep(self.latency)
+        interval = 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+        first_token = time.perf_counter()
+        for i in range(self.tokens):
+            if i:
+                time.sleep(interval)
+            yield {"model": body.get("model"), "response": WORDS[i % len(WORDS)] + " ", "done": False}
+        prompt_tokens = len(prompt.split())
+        yield {
+            "model": body.get("model"),
+            "response": "",
+            "done": True,
+            "context": context + list(range(prompt_tokens + self.tokens)),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": self.tokens,
+            "eval_duration": int((time.perf_counter() - first_token) * 1e9),
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, payload: Dict[str, Any], status: int = 200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                fake.count(self.path)
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": model} for model in fake.models]})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                fake.count(self.path)
+                body = self._body()
+                if self.path == "/api/generate":
+                    chunks = fake.generate(body)
+                    if not body.get("stream", True):
+                        response = ""
+                        for chunk in chunks:
+                            response += chunk["response"]
+                        chunk["response"] = response
+                        self._json(chunk)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in chunks:
+                        line = json.dumps(chunk).encode() + b"\n"
+                        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                elif self.path == "/api/embed":
+                    time.sleep(fake.embed_latency)
+                    texts = body.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._json({"model": body.get("model"), "embeddings": [fake.embedding(t) for t in texts]})
+                elif self.path == "/api/embeddings":
+                    time.sleep(fake.embed_latency)
+                    self._json({"embedding": fake.embedding(body.get("prompt", ""))})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+        return Handler
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--token-rate", type=float, default=50.0, help="generated tokens per second")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per generation")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="seconds per embedding request")
+    parser.add_argument("--dimension", type=int, default=768)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    add_arguments(parser)
+    args = parser.parse_args()
+    fake = FakeOllama(args.host, args.port, args.token_rate, args.tokens, args.latency, args.embed_latency, args.dimension)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,26 @@ AGENT_NAME = os.getenv("AI_AGENT_NAME", "Pal")
 DEFAULT_MODEL = 'gemma:2b'
 EMBEDDING_MODEL = os.getenv("AI_EMBEDDING_MODEL", "nomic-embed-text")
 
+# Ollama server configuration
+OLLAMA_BASE_URL = os.getenv("AI_OLLAMA_BASE_URL", "http://localhost:11434")
+# Comma-separated Ollama endpoints to balance across; defaults to the single base URL
+OLLAMA_HOSTS = os.getenv("AI_OLLAMA_HOSTS", OLLAMA_BASE_URL)
+OLLAMA_RETRIES = int(os.getenv("AI_OLLAMA_RETRIES", "1"))
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("AI_OLLAMA_HEALTH_INTERVAL", "15"))
+OLLAMA_TIMEOUT = float(os.getenv("AI_OLLAMA_TIMEOUT", "120"))
+OLLAMA_POOL_SIZE = int(os.getenv("AI_OLLAMA_POOL_SIZE", "10"))
+OLLAMA_HEADLESS = os.getenv("AI_OLLAMA_HEADLESS", "False").lower() == "true"
+OLLAMA_KEEP_ALIVE = os.getenv("AI_OLLAMA_KEEP_ALIVE", "30m")
+# Scheduler in front of Ollama: concurrent generations, queued requests and how long one may wait
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("AI_OLLAMA_MAX_IN_FLIGHT", "2"))
+OLLAMA_MAX_QUEUE_DEPTH = int(os.getenv("AI_OLLAMA_MAX_QUEUE_DEPTH", "16"))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("AI_OLLAMA_QUEUE_TIMEOUT", "60"))
+
+# Conversation sessions reuse Ollama's context tokens between turns
+MAX_CONVERSATION_SESSIONS = int(os.getenv("AI_MAX_CONVERSATION_SESSIONS", "256"))
+SESSION_IDLE_SECONDS = float(os.getenv("AI_SESSION_IDLE_SECONDS", "1800"))
+SESSION_MAX_CONTEXT_TOKENS = int(os.getenv("AI_SESSION_MAX_CONTEXT_TOKENS", "1800"))
+
 # Memory configuration
 MEMORY_LENGTH = int(os.getenv("AI_MEMORY_LENGTH", "15"))
 CHUNK_SIZE = int(os.getenv("AI_CHUNK_SIZE", "5000"))
@@ -20,6 +40,49 @@ CHUNK_LENGTH = int(os.getenv("AI_CHUNK_LENGTH", "10"))
 PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_DIR = PROJECT_ROOT / "data" / "json_history"
 EMBEDDINGS_DIR = DATA_DIR / "embeddings"
+MEMORY_STORE_DIR = DATA_DIR / "segments"
+MEMORY_SEGMENT_MAX_BYTES = int(os.getenv("AI_MEMORY_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Per-user memory partitions
+USER_PARTITIONS_DIR = DATA_DIR / "users"
+MAX_RESIDENT_PARTITIONS = int(os.getenv("AI_MAX_RESIDENT_PARTITIONS", "64"))
+PARTITION_IDLE_SECONDS = float(os.getenv("AI_PARTITION_IDLE_SECONDS", "1800"))
+EMBEDDING_STORE_DIR = EMBEDDINGS_DIR / "store"
+EMBEDDING_SEGMENT_SIZE = int(os.getenv("AI_EMBEDDING_SEGMENT_SIZE", "1024"))
+BACKFILL_BATCH_SIZE = int(os.getenv("AI_BACKFILL_BATCH_SIZE", "32"))
+# Texts per request to Ollama's multi-input embed endpoint
+EMBEDDING_BATCH_SIZE = int(os.getenv("AI_EMBEDDING_BATCH_SIZE", "64"))
+# Write-behind persistence of interactions: batched on a background thread, journaled to
+# WRITE_BEHIND_JOURNAL until written. The journal makes the queue durable; with an empty string
+# the queue is memory only, and a full buffer makes callers wait up to WRITE_BEHIND_PUT_TIMEOUT
+# seconds before the write is dropped. Disabling the queue writes synchronously on the reply path.
+WRITE_BEHIND_ENABLED = os.getenv("AI_WRITE_BEHIND_ENABLED", "True").lower() == "true"
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("AI_WRITE_BEHIND_BATCH_SIZE", "32"))
+WRITE_BEHIND_MAX_BUFFER = int(os.getenv("AI_WRITE_BEHIND_MAX_BUFFER", "1000"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("AI_WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+WRITE_BEHIND_JOURNAL = os.getenv("AI_WRITE_BEHIND_JOURNAL", str(PROJECT_ROOT / "data" / "write_behind.jsonl"))
+WRITE_BEHIND_PUT_TIMEOUT = float(os.getenv("AI_WRITE_BEHIND_PUT_TIMEOUT", "1.0"))
+# MySQL connection pool shared by the knowledge graph and memory code
+DB_POOL_SIZE = int(os.getenv("AI_DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("AI_DB_POOL_MAX_OVERFLOW", "5"))
+DB_POOL_RECYCLE = float(os.getenv("AI_DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("AI_DB_POOL_TIMEOUT", "10"))
+# Rows per multi-row INSERT when writing edges in bulk
+EDGE_BATCH_SIZE = int(os.getenv("AI_EDGE_BATCH_SIZE", "1000"))
+# Edge upserts are coalesced in memory and flushed in bulk at this many edges or this often
+EDGE_BUFFER_ENABLED = os.getenv("AI_EDGE_BUFFER_ENABLED", "True").lower() == "true"
+EDGE_BUFFER_MAX_SIZE = int(os.getenv("AI_EDGE_BUFFER_MAX_SIZE", "500"))
+EDGE_FLUSH_INTERVAL = float(os.getenv("AI_EDGE_FLUSH_INTERVAL", "2.0"))
+# Cached neighbourhoods for get_related_nodes, invalidated by edge writes (the TTL only guards
+# against writers outside this process)
+NEIGHBOR_CACHE_SIZE = int(os.getenv("AI_NEIGHBOR_CACHE_SIZE", "4096"))
+NEIGHBOR_CACHE_TTL = float(os.getenv("AI_NEIGHBOR_CACHE_TTL", "600"))
+# Multi-hop graph traversal: graphs up to GRAPH_SNAPSHOT_MAX_EDGES edges are walked in memory,
+# larger ones with a recursive CTE; either way a traversal returns within GRAPH_TIME_BUDGET seconds
+GRAPH_SNAPSHOT_MAX_EDGES = int(os.getenv("AI_GRAPH_SNAPSHOT_MAX_EDGES", "500000"))
+GRAPH_SNAPSHOT_TTL = float(os.getenv("AI_GRAPH_SNAPSHOT_TTL", "300"))
+GRAPH_SNAPSHOT_REFRESH = float(os.getenv("AI_GRAPH_SNAPSHOT_REFRESH", "30"))
+GRAPH_TIME_BUDGET = float(os.getenv("AI_GRAPH_TIME_BUDGET", "0.25"))
 
 
 # Ensure directories exist
@@ -29,10 +92,46 @@ EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
 
 # File paths
 CHAT_HISTORY_FILE = PROJECT_ROOT/ ".chat_history.json"
+ACCESS_STATS_FILE = PROJECT_ROOT / "data" / "access_stats.json"
+ACCESS_STATS_FLUSH_INTERVAL = float(os.getenv("AI_ACCESS_STATS_FLUSH_INTERVAL", "30"))
 
 # Search configuration
 DEFAULT_TOP_K = int(os.getenv("AI_DEFAULT_TOP_K", "5"))
 DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("AI_DEFAULT_SIMILARITY_THRESHOLD", "0.0"))
+# Retrieval mode ("hybrid", "vector" or "lexical"); hybrid fuses BM25 and vector rankings
+SEARCH_MODE = os.getenv("AI_SEARCH_MODE", "hybrid").lower()
+SEARCH_EMBEDDING_TIMEOUT = float(os.getenv("AI_SEARCH_EMBEDDING_TIMEOUT", "2.0"))
+RRF_K = int(os.getenv("AI_RRF_K", "60"))
+# When a similarity threshold is set, results without a cosine similarity need this BM25 score instead
+LEXICAL_MIN_SCORE = float(os.getenv("AI_LEXICAL_MIN_SCORE", "1.0"))
+
+# Turn pipeline: context adaptation mode ("auto", "llm", "format" or "skip") and latency budget
+ADAPT_CONTEXT_MODE = os.getenv("AI_ADAPT_CONTEXT_MODE", "auto").lower()
+TURN_LATENCY_BUDGET = float(os.getenv("AI_TURN_LATENCY_BUDGET", "15"))
+ADAPT_MAX_CONCURRENT_TURNS = int(os.getenv("AI_ADAPT_MAX_CONCURRENT_TURNS", "2"))
+ADAPT_CACHE_SIZE = int(os.getenv("AI_ADAPT_CACHE_SIZE", "256"))
+ADAPT_CACHE_TTL = float(os.getenv("AI_ADAPT_CACHE_TTL", "600"))
+FORMATTED_CONTEXT_MAX_CHARS = int(os.getenv("AI_FORMATTED_CONTEXT_MAX_CHARS", "2000"))
+
+# Response cache for deterministic helper prompts (callers opt in with cache=True;
+# set AI_RESPONSE_CACHE_FILE to an empty string to keep it in memory only)
+RESPONSE_CACHE_ENABLED = os.getenv("AI_RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("AI_RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("AI_RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_FILE = os.getenv("AI_RESPONSE_CACHE_FILE", str(PROJECT_ROOT / "data" / "response_cache.sqlite3"))
+# Rows kept in the disk tier; the oldest are deleted past this
+RESPONSE_CACHE_DISK_SIZE = int(os.getenv("AI_RESPONSE_CACHE_DISK_SIZE", "10000"))
+
+# Vector index configuration ("exact" or "ivf")
+VECTOR_INDEX_TYPE = os.getenv("AI_VECTOR_INDEX", "exact").lower()
+IVF_NLIST = int(os.getenv("AI_IVF_NLIST", "256"))
+IVF_NPROBE = int(os.getenv("AI_IVF_NPROBE", "16"))
+ANN_INDEX_FILE = EMBEDDINGS_DIR / "ivf_index.npz"
+
+# Query embedding cache (set AI_EMBEDDING_CACHE_FILE to an empty string to keep it in memory only)
+EMBEDDING_CACHE_SIZE = int(os.getenv("AI_EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_FILE = os.getenv("AI_EMBEDDING_CACHE_FILE", str(PROJECT_ROOT / "data" / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_DISK_SIZE = int(os.getenv("AI_EMBEDDING_CACHE_DISK_SIZE", "50000"))
 
 # Logging configuration
 LOG_LEVEL = os.getenv("AI_LOG_LEVEL", "WARNING")
@@ -1,85 +1,69 @@
 import os
-import json
-from pathlib import Path
-from typing import List, Dict, Any
-import hashlib
-import mysql.connector
+from typing import List, Dict, Any, Tuple
 from mysql.connector import Error
-from dotenv import load_dotenv
 
 # Adjust the import path as necessary
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.modules.kb_graph import analyze_file_pair, update_knowledge_graph, create_edge, get_related_nodes
+from src.modules.kb_graph import analyze_file_pair, knowledge_graph_edges, create_edges, get_db_connection
+from src.modules.partitions import partitions
+from src.modules.errors import PoolTimeoutError
 
-DATA_DIR = Path('data')
+def load_memories() -> List[Tuple[str, Dict[str, Any]]]:
+    memories = []
+    for key in partitions.keys():
+        with partitions.borrow(key) as partition:
+            memories.extend(partition.memory_store.scan())
+    return memories
 
-load_dotenv()
-
-DB_HOST = os.getenv("host")
-DB_USER = os.getenv("user")
-DB_PASSWORD = os.getenv("password")
-DB_NAME = os.getenv("database")
-
-def load_json_files(directory: Path) -> List[Dict[str, Any]]:
-    json_files = []
-    for file_path in directory.glob('**/*.json'):
-        print(file_path)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            try:
-                data = json.load(file)
-                json_files.append(data)
-            except json.JSONDecodeError:
-                print(f"Error decoding JSON from file: {file_path}")
-    return json_files
-
-def process_files(files: List[Dict[str, Any]]):
+def flush_edges(edges: List[Tuple[str, str, str, float]]) -> int:
     try:
-        conn = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
-        if not conn.is_connected():
-            print("Failed to connect to the database.")
-            return
-        
-        cursor = conn.cursor()
-
-        for i, file1 in enumerate(files):
-            try:
-                update_knowledge_graph(file1)
-                file1_id = hashlib.md5(json.dumps(file1, sort_keys=True).encode()).hexdigest()
+        return create_edges(edges)
+    except Error as e:
+        print(f"Error inserting {len(edges)} edges into database: {e}")
+        return 0
+    finally:
+        edges.clear()
 
-                for file2 in files[i+1:]:
-                    try:
-                        file2_id = hashlib.md5(json.dumps(file2, sort_keys=True).encode()).hexdigest()
-                        edge_categories = analyze_file_pair(file1, file2)
+def process_files(files: List[Tuple[str, Dict[str, Any]]], flush_every: int = 10000):
+    try:
+        # Checked out from the shared pool, so the edge writes reuse this connection
+        with get_db_connection() as conn:
+            if not conn.is_connected():
+                print("Failed to connect to the database.")
+                return
+    except (Error, PoolTimeoutError) as e:
+        print(f"Error connecting to the database: {e}")
+        return
 
-                        for category, strength in edge_categories:
-                            try:
-                                create_edge(file1_id, file2_id, category, strength)
-                            except Error as e:
-                                print(f"Error inserting edge into database: {e}")
-                    except Exception as e:
-                        print(f"Error processing file pair: {e}")
-            except Exception as e:
-                print(f"Error processing file: {e}")
+    # Edges are collected and written with bulk upserts, one commit per flush
+    edges: List[Tuple[str, str, str, float]] = []
+    written = 0
+    # Memories are graph nodes under their memory-store ids, as save_history writes them
+    for i, (file1_id, file1) in enumerate(files):
+        try:
+            edges.extend(knowledge_graph_edges(file1, file1_id))
 
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("Migration complete and data committed to the database.")
+            for file2_id, file2 in files[i+1:]:
+                try:
+                    edge_categories = analyze_file_pair(file1, file2)
+                    edges.extend((file1_id, file2_id, category, strength) for category, strength in edge_categories)
+                except Exception as e:
+                    print(f"Error processing file pair: {e}")
+        except Exception as e:
+            print(f"Error processing file: {e}")
+        if len(edges) >= flush_every:
+            written += flush_edges(edges)
+            print(f"Processed {i + 1}/{len(files)} memories, {written} edges written")
 
-    except Error as e:
-        print(f"Error connecting to the database: {e}")
+    written += flush_edges(edges)
+    print(f"Migration complete: {written} edges committed to the database.")
 
 def main():
     print("Starting migration process...")
-    files = load_json_files(DATA_DIR)
-    print(f"Loaded {len(files)} JSON files.")
+    files = load_memories()
+    print(f"Loaded {len(files)} memories.")
 
     process_files(files)
 
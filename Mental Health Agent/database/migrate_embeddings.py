@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+# Adjust the import path as necessary
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDINGS_DIR
+from src.modules.embeddings import embedding_store
+from src.modules.embedding_store import convert_json_embeddings
+
+def main():
+    source_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else EMBEDDINGS_DIR
+    print(f"Converting JSON embeddings from {source_dir} into {embedding_store.directory}...")
+    converted = convert_json_embeddings(source_dir, embedding_store)
+    print(f"Converted {converted} embeddings. The store now holds {len(embedding_store)} vectors.")
+    print("The legacy <name>.json.json files can be removed once the conversion has been checked.")
+
+if __name__ == "__main__":
+    main()
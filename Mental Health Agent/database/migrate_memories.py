@@ -0,0 +1,41 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+
+# Adjust the import path as necessary
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATA_DIR
+from src.modules.memory_store import memory_store
+from src.modules.backfill import embedding_backfill
+
+def main():
+    parser = argparse.ArgumentParser(description="Move one-file-per-memory JSON history into the segment store.")
+    parser.add_argument("source", nargs="?", default=str(DATA_DIR), help="directory holding the legacy memory files")
+    parser.add_argument("--delete", action="store_true", help="remove legacy files once they are in the store")
+    parser.add_argument("--compact", action="store_true", help="rewrite the store without superseded records")
+    parser.add_argument("--embed", action="store_true", help="embed memories that have no vector yet, in batches")
+    args = parser.parse_args()
+
+    print(f"Importing memories from {args.source} into {memory_store.directory}...")
+    imported = memory_store.import_legacy(Path(args.source), delete_files=args.delete)
+    print(f"Imported {imported} memories.")
+
+    if args.compact:
+        print("Compacting memory store...")
+        memory_store.compact()
+
+    stats = memory_store.stats()
+    print(f"Store holds {stats['memories']} memories in {stats['segments']} segments "
+          f"({stats['live_bytes']} live bytes, {stats['dead_bytes']} reclaimable).")
+
+    if args.embed:
+        print("Embedding memories without vectors...")
+        embedding_backfill.run()
+        status = embedding_backfill.status()
+        print(f"Embedded {status['done']}/{status['total']} memories ({status['failed']} failed) "
+              f"at {status['texts_per_second']:.1f} texts/s.")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,42 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from dotenv import load_dotenv
 import os
 from routes.whatsapp_route import router as whatsapp_router
+from src.modules.backfill import embedding_backfill
+from src.modules.access_stats import access_stats
+from src.modules.save_history import write_queue
+from src.modules.kb_graph import db_pool, edge_buffer, neighbor_cache, graph_traversal
+from src.modules.logging_setup import logger
+from src.modules.ollama_client import default_client, default_async_client, default_router
 
 
 load_dotenv()
 
 IS_DEV_ENVIRONMENT = os.getenv("IS_DEV_ENVIRONMENT", "False").lower() == "true"
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # There is no console under uvicorn, so skip the live terminal rendering
+    default_client.headless = True
+    # Embed any memories missing vectors once the server is up, without blocking startup
+    embedding_backfill.start()
+    write_queue.start()
+    yield
+    embedding_backfill.stop(timeout=5)
+    # Drain queued interaction writes; anything left over is replayed from the journal on restart
+    write_queue.stop(timeout=10)
+    edge_buffer.stop(timeout=10)
+    logger.info(f"Database pool at shutdown: {db_pool.stats()}")
+    logger.info(f"Neighbour cache at shutdown: {neighbor_cache.stats()}")
+    logger.info(f"Graph traversal at shutdown: {graph_traversal.stats()}")
+    db_pool.close()
+    access_stats.stop()
+    default_client.close()
+    await default_async_client.close()
+    default_router.stop()
+
 # Create main FastAPI app
 app = FastAPI(
     title="WhatsApp Chatbot API",
@@ -16,6 +44,7 @@ app = FastAPI(
     openapi_url="/openapi.json" if IS_DEV_ENVIRONMENT else None,
     docs_url="/docs" if IS_DEV_ENVIRONMENT else None,
     redoc_url="/redoc" if IS_DEV_ENVIRONMENT else None,
+    lifespan=lifespan,
 )
 
 app.include_router(whatsapp_router)
@@ -1,17 +1,48 @@
 from src.modules.logging_setup import logger
 from src.modules.errors import InputError, APIConnectionError
-from src.modules.ollama_client import process_prompt
+from src.modules.ollama_client import converse
+from src.modules.session_store import conversation_sessions
 # from src.modules.input import get_user_input
 from config import DEFAULT_MODEL, AGENT_NAME
 from rich.prompt import Confirm, Prompt
-from src.modules.save_history import chat_history
-from src.modules.context_management import gather_context, adapt_context_to_user
+from src.modules.save_history import chat_history, queue_chat_entry, write_queue
+from src.modules.context_management import gather_context_sections, format_context
+from src.modules.turn_pipeline import Turn
+
+# Static instructions, prefilled once per conversation session; each turn only sends the user's message
+SYSTEM_PROMPT = f"""
+            You are a compassionate and empathetic AI assistant known as {AGENT_NAME}, designed to engage in thoughtful and supportive conversations every day.
+            Your role is to offer friendly, non-judgmental support and be someone the user can talk to, no matter how they are feeling. 
+            Focus on creating a space where the user feels comfortable sharing their thoughts, whether they're having a good day, a neutral day, or a bad day.
+            Your responses should never assume that the user is in distress; instead, engage in a conversation with the goal of being present, listening, and offering support when necessary.
+            You should ask open-ended questions and be empathetic without overloading the user with advice unless they ask for it.
+            It's important to foster a positive, warm connection, and be ready to provide resources or suggestions if the user needs them.
+            You are there to listen and provide comfort, no matter what the situation is.
+            """
+
+def turn_prompt(user_message, context=""):
+    """
+    The per-turn prompt: the user's message, preceded by the adapted memories when there are any.
+    """
+    prompt = f"Respond kindly and supportively to: {user_message}"
+    if context and context.strip():
+        prompt = f"Context for this reply (do not repeat it to the user):\n{context.strip()}\n\n{prompt}"
+    return prompt
 
 class MentalHealthAgent:
     def __init__(self, model_name=DEFAULT_MODEL):
         self.model_name = model_name
         self.context = ""
         self.conversation_history = []
+        self.user_histories = {}
+
+    def history_for(self, user_id=None):
+        """
+        Conversation turns of one user; turns without a user id share the default history.
+        """
+        if user_id is None:
+            return self.conversation_history
+        return self.user_histories.setdefault(str(user_id), [])
 
     def run_agent(self, user_message=None, user_id=None):
         logger.info(f"Starting {AGENT_NAME} Mental Health Agent")
@@ -24,29 +55,34 @@ class MentalHealthAgent:
             return "Continuing our conversation, I'm here for you! 😊"
         
         if user_message.lower() == 'clear history':
+            # Queued entries would otherwise land in the history after it is cleared
+            write_queue.flush()
             chat_history.clear()
-            self.conversation_history.clear()
+            self.history_for(user_id).clear()
+            conversation_sessions.reset(user_id)
             logger.info("Conversation history and context cleared.")
             return "History Cleared 🧹"
  
         try:
             logger.info(f"User input: {user_message}")
-            prompt = f"""
-            You are a compassionate and empathetic AI assistant known as {AGENT_NAME}, designed to engage in thoughtful and supportive conversations every day.
-            Respond kindly and supportively to: {user_message}.
-            Your role is to offer friendly, non-judgmental support and be someone the user can talk to, no matter how they are feeling. 
-            Focus on creating a space where the user feels comfortable sharing their thoughts, whether they're having a good day, a neutral day, or a bad day.
-            Your responses should never assume that the user is in distress; instead, engage in a conversation with the goal of being present, listening, and offering support when necessary.
-            You should ask open-ended questions and be empathetic without overloading the user with advice unless they ask for it.
-            It's important to foster a positive, warm connection, and be ready to provide resources or suggestions if the user needs them.
-            You are there to listen and provide comfort, no matter what the situation is.
-            """
-            self.context = gather_context(user_message, self.conversation_history, AGENT_NAME)
-            self.context = adapt_context_to_user(self.context, self.model_name)
-            response = process_prompt(prompt, self.model_name, "MentalHealthAgent", self.context)
+            conversation_history = self.history_for(user_id)
+            turn = Turn(user_id)
+            try:
+                with turn.stage("gather"):
+                    memory_context, history_context = gather_context_sections(
+                        user_message, conversation_history, AGENT_NAME, user_id)
+                # Only the memories are adapted. The recent conversation goes through as it is,
+                # and only when the session starts: after that Ollama's context tokens hold it
+                self.context = turn.adapt_context(memory_context, self.model_name)
+                prompt = turn_prompt(user_message, self.context)
+                with turn.stage("generate"):
+                    response = converse(prompt, SYSTEM_PROMPT, self.model_name, "MentalHealthAgent", user_id,
+                                        history=format_context(history_context))
+            finally:
+                turn.finish()
             logger.info(f"Agent response: {response}")
-            self.conversation_history.append((user_message, response))
-            chat_history.add_entry(user_message, response)
+            conversation_history.append((user_message, response))
+            queue_chat_entry(user_message, response)
 
             # Return the generated response
             return response
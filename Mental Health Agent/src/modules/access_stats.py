@@ -0,0 +1,124 @@
+# src/modules/access_stats.py
+
+import os
+import atexit
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from config import ACCESS_STATS_FILE, ACCESS_STATS_FLUSH_INTERVAL
+from .file_utils import read_json_file, write_json_file
+from .logging_setup import logger
+
+class AccessStats:
+    """
+    Write-behind access counters for memories.
+
+    Hits are counted in memory and written to a single stats file in periodic
+    batches instead of rewriting each memory file on every read. The stats file
+    is authoritative; the ``access_count`` stored inside a memory file is only
+    used as the starting value for memories that were never counted here.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 30.0):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._last_access: Dict[str, str] = {}
+        self._pending: Counter = Counter()
+        self._loaded = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.flushes = 0
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            data = read_json_file(self.path)
+            self._counts = {k: int(v) for k, v in data.get("access_count", {}).items()}
+            self._last_access = dict(data.get("last_access", {}))
+        except Exception as e:
+            logger.error(f"Error loading access stats from {self.path}: {str(e)}")
+
+    def record_access(self, memory_id: str, base_count: int = 0) -> int:
+        """
+        Count one access and return the memory's new total.
+        """
+        with self._lock:
+            self._load()
+            count = self._counts.get(memory_id, base_count) + 1
+            self._counts[memory_id] = count
+            self._last_access[memory_id] = datetime.now().isoformat()
+            self._pending[memory_id] += 1
+        self.start()
+        return count
+
+    def get(self, memory_id: str, default: int = 0) -> int:
+        with self._lock:
+            self._load()
+            return self._counts.get(memory_id, default)
+
+    def most_accessed(self, limit: int = 10) -> List[Tuple[str, int]]:
+        with self._lock:
+            self._load()
+            return Counter(self._counts).most_common(limit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked": len(self._counts),
+                "pending": sum(self._pending.values()),
+                "flushes": self.flushes,
+            }
+
+    def flush(self):
+        """
+        Persist all counts accumulated since the last flush in one write.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            data = {"access_count": dict(self._counts), "last_access": dict(self._last_access)}
+            pending = self._pending
+            self._pending = Counter()
+        try:
+            temp_path = self.path.with_suffix(".tmp")
+            write_json_file(temp_path, data)
+            os.replace(temp_path, self.path)
+            self.flushes += 1
+            logger.debug(f"Flushed {sum(pending.values())} memory accesses to {self.path}")
+        except Exception as e:
+            logger.error(f"Error flushing access stats to {self.path}: {str(e)}")
+            with self._lock:
+                self._pending.update(pending)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="access-stats-flush", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """
+        Stop the periodic flusher and write out anything still pending.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+access_stats = AccessStats(ACCESS_STATS_FILE, ACCESS_STATS_FLUSH_INTERVAL)
+atexit.register(access_stats.flush)
@@ -11,7 +11,7 @@ def update_bullet_points(response: str, model_name: str) -> List[str]:
     """
     logger.info("Extracting bullet points from response")
     bullet_prompt = f"Extract 3-5 key points from this text as a bullet point list: {response}"
-    bullets = process_prompt(bullet_prompt, model_name, "BulletPointExtractor")
+    bullets = process_prompt(bullet_prompt, model_name, "BulletPointExtractor", cache=True)
     return [b.strip() for b in bullets.split('\n') if b.strip()]
 
 
@@ -22,7 +22,7 @@ def rank_bullet_points(bullet_points: List[str], model_name: str, max_points: in
     logger.info(f"Ranking bullet points, keeping top {max_points}")
     if len(bullet_points) > max_points:
         rank_prompt = "Rank the following bullet points by importance and relevance:\n" + "\n".join(bullet_points)
-        ranked = process_prompt(rank_prompt, model_name, "BulletPointRanker")
+        ranked = process_prompt(rank_prompt, model_name, "BulletPointRanker", cache=True)
         return [b.strip() for b in ranked.split('\n') if b.strip()][:max_points]
     return bullet_points
 
@@ -70,7 +70,7 @@ def generate_search_queries(user_input: str, model_name: str) -> List[str]:
     "{user_input}"
     Provide your response as a comma-separated list of queries.
     """
-    queries = process_prompt(query_prompt, model_name, "SearchQueryGenerator")
+    queries = process_prompt(query_prompt, model_name, "SearchQueryGenerator", cache=True)
     return [q.strip() for q in queries.split(',') if q.strip()]
 
 
@@ -83,7 +83,7 @@ def summarize_search_results(results: List[str], model_name: str) -> str:
     {' '.join(results)}
     Provide a concise summary that captures the main points and relevant information.
     """
-    return process_prompt(summary_prompt, model_name, "SearchSummarizer")
+    return process_prompt(summary_prompt, model_name, "SearchSummarizer", cache=True)
 
 
 def evaluate_response(response: str, user_input: str, model_name: str) -> Dict[str, Any]:
@@ -104,7 +104,7 @@ def evaluate_response(response: str, user_input: str, model_name: str) -> Dict[s
         "suggestions": ["Suggestion 1", "Suggestion 2"]
     }}
     """
-    eval_result = process_prompt(eval_prompt, model_name, "ResponseEvaluator")
+    eval_result = process_prompt(eval_prompt, model_name, "ResponseEvaluator", cache=True)
     try:
         return json.loads(eval_result)
     except json.JSONDecodeError:
@@ -126,7 +126,7 @@ def generate_examples(concept: str, model_name: str, num_examples: int = 3) -> L
     example_prompt = f"""Generate {num_examples} diverse examples that illustrate the concept of "{concept}".
     Provide your response as a numbered list.
     """
-    examples = process_prompt(example_prompt, model_name, "ExampleGenerator")
+    examples = process_prompt(example_prompt, model_name, "ExampleGenerator", cache=True)
     return [e.strip() for e in examples.split('\n') if e.strip()]
 
 
@@ -138,7 +138,7 @@ def explain_concept(concept: str, model_name: str, complexity: str = "medium") -
     explanation_prompt = f"""Explain the concept of "{concept}" at a {complexity} level of complexity.
     Provide a clear and concise explanation that is appropriate for the specified complexity level.
     """
-    return process_prompt(explanation_prompt, model_name, "ConceptExplainer")
+    return process_prompt(explanation_prompt, model_name, "ConceptExplainer", cache=True)
 
 
 def generate_analogies(concept: str, model_name: str, num_analogies: int = 2) -> List[str]:
@@ -149,7 +149,7 @@ def generate_analogies(concept: str, model_name: str, num_analogies: int = 2) ->
     analogy_prompt = f"""Generate {num_analogies} analogies that help explain the concept of "{concept}".
     Provide your response as a numbered list.
     """
-    analogies = process_prompt(analogy_prompt, model_name, "AnalogyGenerator")
+    analogies = process_prompt(analogy_prompt, model_name, "AnalogyGenerator", cache=True)
     return [a.strip() for a in analogies.split('\n') if a.strip()]
 
 
@@ -169,7 +169,7 @@ def fact_check(statement: str, model_name: str) -> Dict[str, Any]:
         "sources": ["Source 1", "Source 2"]
     }}
     """
-    fact_check_result = process_prompt(fact_check_prompt, model_name, "FactChecker")
+    fact_check_result = process_prompt(fact_check_prompt, model_name, "FactChecker", cache=True)
     try:
         return json.loads(fact_check_result)
     except json.JSONDecodeError:
@@ -0,0 +1,149 @@
+# src/modules/ann_index.py
+
+import numpy as np
+from pathlib import Path
+from typing import List, Optional
+from config import VECTOR_INDEX_TYPE, IVF_NLIST, IVF_NPROBE, ANN_INDEX_FILE
+from .logging_setup import logger
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest neighbour index.
+
+    Unit vectors are assigned to the nearest of ``nlist`` spherical k-means
+    centroids. A query only scores the rows in its ``nprobe`` closest lists,
+    so cost grows with ``n * nprobe / nlist`` instead of ``n``. Row positions
+    refer to the owning VectorIndex matrix; only the centroids are persisted.
+    """
+
+    def __init__(self, nlist: int = 64, nprobe: int = 8, path: Optional[Path] = None,
+                 min_train_size: Optional[int] = None, retrain_growth: float = 4.0,
+                 iterations: int = 15, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.path = Path(path) if path else None
+        self.min_train_size = min_train_size or nlist * 16
+        self.retrain_growth = retrain_growth
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._lists: List[np.ndarray] = []
+        self._list_sizes: Optional[np.ndarray] = None
+        self._assignments = {}
+        if self.path and self.path.exists():
+            self.load()
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, size: int) -> bool:
+        if not self.trained:
+            return size >= self.min_train_size
+        return size >= self.trained_size * self.retrain_growth
+
+    def train(self, vectors: np.ndarray):
+        """
+        Fit centroids with spherical k-means on (a sample of) the given unit vectors.
+        """
+        rng = np.random.default_rng(self.seed)
+        nlist = min(self.nlist, len(vectors))
+        sample_size = min(len(vectors), nlist * 256)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1.0, norms)
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = len(vectors)
+        logger.info(f"Trained IVF index with {nlist} lists on {sample_size} of {len(vectors)} vectors")
+        self.save()
+
+    def rebuild(self, vectors: np.ndarray):
+        """
+        Reassign every row of the owning matrix to its nearest centroid.
+        """
+        nlist = len(self.centroids)
+        self._lists = [np.empty(16, dtype=np.int64) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self._assignments = {}
+        if len(vectors):
+            for position, label in enumerate(np.argmax(vectors @ self.centroids.T, axis=1)):
+                self._append(int(label), position)
+
+    def _append(self, label: int, position: int):
+        size = self._list_sizes[label]
+        if size == len(self._lists[label]):
+            grown = np.empty(size * 2, dtype=np.int64)
+            grown[:size] = self._lists[label][:size]
+            self._lists[label] = grown
+        self._lists[label][size] = position
+        self._list_sizes[label] = size + 1
+        self._assignments[position] = label
+
+    def add(self, position: int, row: np.ndarray):
+        if not self.trained:
+            return
+        label = int(np.argmax(self.centroids @ row))
+        previous = self._assignments.get(position)
+        if previous == label:
+            return
+        if previous is not None:
+            members = self._lists[previous][:self._list_sizes[previous]]
+            kept = members[members != position]
+            self._lists[previous][:len(kept)] = kept
+            self._list_sizes[previous] = len(kept)
+        self._append(label, position)
+
+    def reset(self):
+        if self.trained:
+            self.rebuild(np.empty((0, self.centroids.shape[1]), dtype=np.float32))
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Row positions stored in the lists closest to a unit query vector.
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        parts = [self._lists[label][:self._list_sizes[label]] for label in probe]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def save(self):
+        if not self.path or not self.trained:
+            return
+        try:
+            with self.path.open('wb') as f:
+                np.savez(f, centroids=self.centroids, trained_size=self.trained_size)
+            logger.info(f"Saved IVF centroids to {self.path}")
+        except OSError as e:
+            logger.error(f"Error saving IVF index to {self.path}: {str(e)}")
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                self.centroids = data["centroids"].astype(np.float32)
+                self.trained_size = int(data["trained_size"])
+            self.rebuild(np.empty((0, self.centroids.shape[1]), dtype=np.float32))
+            logger.info(f"Loaded IVF centroids from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading IVF index from {self.path}: {str(e)}")
+            self.centroids = None
+
+def create_ann_index(path: Optional[Path] = None) -> Optional[IVFIndex]:
+    """
+    Build the ANN index selected by AI_VECTOR_INDEX, or None for exact search.
+    """
+    if VECTOR_INDEX_TYPE == "ivf":
+        return IVFIndex(nlist=IVF_NLIST, nprobe=IVF_NPROBE, path=path or ANN_INDEX_FILE)
+    if VECTOR_INDEX_TYPE != "exact":
+        logger.warning(f"Unknown vector index type '{VECTOR_INDEX_TYPE}', using exact search")
+    return None
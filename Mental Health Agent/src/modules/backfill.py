@@ -0,0 +1,165 @@
+# src/modules/backfill.py
+
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from config import BACKFILL_BATCH_SIZE
+from .logging_setup import logger
+from .errors import OverloadedError
+from .embeddings import memory_text, embed_batch
+from .vector_index import memory_metadata
+from .partitions import MemoryPartition, partitions
+from .ollama_client import BACKGROUND, scheduler
+
+class EmbeddingBackfill:
+    """
+    Embeds memories that have no stored vector on a background thread.
+
+    Texts are sent to Ollama in batches, and every finished batch is written to
+    its partition's embedding store and, if resident, its index, so searches
+    running alongside the backfill already see the vectors that exist.
+    """
+
+    def __init__(self, batch_size: int = 32):
+        self.batch_size = batch_size
+        self.retry_delay = 5.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="embedding-backfill", daemon=True)
+        self._thread.start()
+        logger.info("Started background embedding backfill")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @staticmethod
+    def pending_memories(partition: MemoryPartition) -> List[Tuple[MemoryPartition, str]]:
+        return [
+            (partition, memory_id)
+            for memory_id in partition.memory_store.ids()
+            if memory_id not in partition.embedding_store
+        ]
+
+    def run(self):
+        """
+        Walk the partitions one at a time, so only the one being backfilled
+        is opened in addition to those in use.
+        """
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.total = self.done = self.failed = 0
+        try:
+            keys = partitions.keys()
+        except Exception as e:
+            logger.error(f"Embedding backfill could not list partitions: {str(e)}")
+            keys = []
+        for key in keys:
+            if self._stop.is_set():
+                logger.info("Embedding backfill stopped before completion")
+                break
+            try:
+                with partitions.borrow(key) as partition:
+                    self._backfill_partition(partition)
+            except Exception as e:
+                logger.error(f"Embedding backfill failed for partition {key}: {str(e)}")
+        logger.info(f"Embedding backfill finished: {self.done}/{self.total} embedded, {self.failed} failed")
+        self.finished_at = time.monotonic()
+
+    def _backfill_partition(self, partition: MemoryPartition):
+        pending = self.pending_memories(partition)
+        if not pending:
+            return
+        self.total += len(pending)
+        logger.info(f"Embedding backfill found {len(pending)} memories without vectors in partition {partition.key}")
+        for start in range(0, len(pending), self.batch_size):
+            if self._stop.is_set():
+                return
+            self._embed_batch(pending[start:start + self.batch_size])
+            status = self.status()
+            logger.info(f"Embedding backfill progress: {status['done']}/{status['total']} "
+                        f"({status['failed']} failed, {status['texts_per_second']:.1f} texts/s)")
+
+    def _embed_batch(self, memory_ids: List[Tuple[MemoryPartition, str]]):
+        records: List[Tuple[MemoryPartition, str, Dict[str, Any]]] = []
+        for partition, memory_id in memory_ids:
+            try:
+                memory_data = partition.memory_store.get(memory_id)
+            except Exception as e:
+                logger.error(f"Embedding backfill skipped {memory_id}: {str(e)}")
+                memory_data = None
+            if memory_data is None:
+                self.failed += 1
+                continue
+            # Legacy JSON vectors are migrated without another embedding request
+            if embeddings := partition.load_vector(memory_id):
+                self._add_to_index(partition, memory_id, embeddings, memory_data)
+                self.done += 1
+            else:
+                records.append((partition, memory_id, memory_data))
+        if not records:
+            return
+        try:
+            vectors = self._embed_when_idle([memory_text(memory_data) for _, _, memory_data in records])
+        except Exception as e:
+            logger.error(f"Error generating embeddings for a backfill batch of {len(records)}: {str(e)}")
+            self.failed += len(records)
+            return
+        by_partition: Dict[str, Tuple[MemoryPartition, List[Tuple[str, List[float]]]]] = {}
+        for (partition, name, _), vector in zip(records, vectors):
+            by_partition.setdefault(partition.key, (partition, []))[1].append((name, vector))
+        for partition, items in by_partition.values():
+            partition.embedding_store.append_many(items)
+        for (partition, name, memory_data), vector in zip(records, vectors):
+            self._add_to_index(partition, name, vector, memory_data)
+        self.done += len(records)
+
+    def _embed_when_idle(self, texts: List[str]) -> List[List[float]]:
+        """
+        Backfill is maintenance work: it queues behind interactive replies and
+        helpers, and backs off instead of failing while Ollama is overloaded.
+        """
+        while True:
+            try:
+                with scheduler.slot(BACKGROUND):
+                    return embed_batch(texts)
+            except OverloadedError:
+                if self._stop.wait(self.retry_delay):
+                    raise
+
+    @staticmethod
+    def _add_to_index(partition: MemoryPartition, memory_id: str, vector: List[float], memory_data: Dict[str, Any]):
+        # Cold partitions pick the vector up from their store when they are next loaded
+        if partition.index.loaded:
+            partition.index.add(memory_id, vector, memory_metadata(memory_data))
+
+    def status(self) -> Dict[str, Any]:
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "running": self.running,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "elapsed_seconds": elapsed,
+            "texts_per_second": self.done / elapsed if elapsed > 0 else 0.0,
+        }
+
+embedding_backfill = EmbeddingBackfill(BACKFILL_BATCH_SIZE)
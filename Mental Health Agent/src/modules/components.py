@@ -58,7 +58,7 @@ def analyze_input(user_input: str, config: Dict[str, Any]) -> Dict[str, Any]:
     }}
     """
 
-    analysis_result = process_prompt(analysis_prompt, DEFAULT_MODEL, "InputAnalyzer")
+    analysis_result = process_prompt(analysis_prompt, DEFAULT_MODEL, "InputAnalyzer", cache=True)
 
     # print(f"Raw Analysis Result: {analysis_result}")  
 
@@ -161,7 +161,7 @@ def assess_response_quality(response: str, context: str, config: Dict[str, Any])
     Provide a quality score between 0 and 1, and a brief explanation.
     Format your response as: (score, "explanation")
     """
-    result = process_prompt(assessment_prompt, config['DEFAULT_MODEL'], "QualityAssessor")
+    result = process_prompt(assessment_prompt, config['DEFAULT_MODEL'], "QualityAssessor", cache=True)
     try:
         return eval(result)  # Note: In production, use a more secure method to parse this
     except Exception as e:
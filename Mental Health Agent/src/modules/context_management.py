@@ -1,19 +1,31 @@
 # src/modules/context_management.py
 
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from src.modules.memory_search import search_memories
 from src.modules.logging_setup import logger
 from src.modules.errors import DataProcessingError
 from src.modules.ollama_client import process_prompt
+from src.modules.stage_timing import timed
 
-def gather_context(user_input: str, conversation_history: List[Dict[str, str]], agent_name: str) -> str:
+def gather_context(user_input: str, conversation_history: List[Dict[str, str]], agent_name: str, user_id: Optional[str] = None) -> str:
     """
     Gather context from various sources for a given user input.
+    Memories are searched only within the user's own partition.
+    """
+    memory_context, history_context = gather_context_sections(user_input, conversation_history, agent_name, user_id)
+    return f"{memory_context}\n\n{history_context}\n\n"
+
+def gather_context_sections(user_input: str, conversation_history: List[Dict[str, str]], agent_name: str,
+                            user_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+    The retrieved-memory and recent-conversation sections of the context, kept
+    apart so the memories can be adapted and cached while history changes every turn.
     """
     try:
         # Retrieve relevant memories
-        memories = search_memories(user_input, top_k=3, similarity_threshold=0.7)
+        with timed("search"):
+            memories = search_memories(user_input, top_k=3, similarity_threshold=0.7, user_id=user_id)
         memory_context = "\n".join([f"💾 Related info: {m['content']}" for m in memories])
 
         # Get recent conversation history
@@ -24,11 +36,8 @@ def gather_context(user_input: str, conversation_history: List[Dict[str, str]],
         )
         # history_context = "\n".join([f"👤 User: {h.get('prompt', '')}\n🤖 {agent_name}: {h.get('response', '')}" for h in recent_history])
 
-        # Combine all context
-        full_context = f"📚 Relevant information:\n{memory_context}\n\n💬 Recent conversation:\n{history_context}\n\n"
-
         logger.info("Context gathering completed successfully")
-        return full_context
+        return f"📚 Relevant information:\n{memory_context}", f"💬 Recent conversation:\n{history_context}"
     except Exception as e:
         logger.error(f"Error gathering context: {str(e)}")
         raise DataProcessingError(f"Failed to gather context: {str(e)}")
@@ -55,7 +64,23 @@ def update_context(current_context: str, new_information: str, model_name: str)
         return current_context  # Return original context if update fails
 
 
-def adapt_context_to_user(context: str, model_name: str) -> str:
+def format_context(context: str, max_chars: int = 2000) -> str:
+    """
+    Deterministic stand-in for adapt_context_to_user: drops empty lines and
+    sections and trims the context to max_chars without calling the LLM.
+    """
+    sections = []
+    for section in context.split("\n\n"):
+        lines = [line.strip() for line in section.splitlines() if line.strip()]
+        # A section with only its heading has nothing to contribute
+        if len(lines) > 1:
+            sections.append("\n".join(lines))
+    formatted = "\n\n".join(sections)
+    if len(formatted) > max_chars:
+        formatted = formatted[:max_chars].rsplit("\n", 1)[0]
+    return formatted
+
+def adapt_context_to_user(context: str, model_name: str, user_id: Optional[str] = None) -> str:
     """
     Adapt the context to a specific user's profile and preferences.
     """
@@ -69,7 +94,7 @@ def adapt_context_to_user(context: str, model_name: str) -> str:
         Ensure the adaptation remains compassionate, maintains the integrity of the conversation, and keeps it flowing naturally, while being sensitive to the user's emotional needs.
 
         """
-        return process_prompt(adapt_prompt, model_name, "ContextAdapter")
+        return process_prompt(adapt_prompt, model_name, "ContextAdapter", user_id=user_id)
     except Exception as e:
         logger.error(f"Error adapting context to user: {str(e)}")
         return context  
\ No newline at end of file
@@ -0,0 +1,217 @@
+# src/modules/db_pool.py
+
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List
+from .logging_setup import logger
+from .errors import PoolTimeoutError
+
+class PooledConnection:
+    """
+    A checked-out connection. Closing it, or leaving its ``with`` block, hands
+    it back to the pool instead of closing the socket. Whatever was not
+    committed by then is rolled back.
+    """
+
+    def __init__(self, pool: "ConnectionPool", conn: Any, created_at: float):
+        self._pool = pool
+        self._conn = conn
+        self.created_at = created_at
+
+    def __getattr__(self, name: str):
+        if self._conn is None:
+            raise AttributeError(f"Connection was returned to the pool; cannot access {name}")
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn, self.created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+
+    Keeps up to ``size`` idle connections and opens up to ``max_overflow`` more
+    under load, which are closed when returned. Connections older than
+    ``recycle`` seconds are replaced and idle ones are pinged on checkout, so a
+    connection dropped by the server is never handed out. Checkouts wait up to
+    ``timeout`` seconds for a free connection.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = 5, max_overflow: int = 5,
+                 recycle: float = 1800, timeout: float = 10.0, pre_ping: bool = True):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self._idle: deque = deque()
+        self._open: Dict[int, float] = {}
+        # Connections being opened outside the lock, counted against the limit
+        self._connecting = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._waits = deque(maxlen=1024)
+        self.checkouts = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.ping_failures = 0
+        self.reset_failures = 0
+
+    def connection(self) -> PooledConnection:
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        with self._available:
+            while True:
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                    break
+                if len(self._open) + self._connecting < self.size + self.max_overflow:
+                    conn, created_at = None, None
+                    self._connecting += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(f"No database connection became free within {self.timeout}s "
+                                           f"({len(self._open)} open)")
+                self._available.wait(remaining)
+        waited = time.perf_counter() - started
+
+        if conn is not None:
+            conn, created_at = self._validate(conn, created_at)
+        else:
+            conn, created_at = self._new_connection()
+
+        with self._lock:
+            self.checkouts += 1
+            self._waits.append(waited)
+            if waited > 0.001:
+                self.waited += 1
+        return PooledConnection(self, conn, created_at)
+
+    def _new_connection(self):
+        """
+        Open a connection whose slot was already reserved by incrementing _connecting.
+        """
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._available:
+                self._connecting -= 1
+                self._available.notify()
+            raise
+        created_at = time.monotonic()
+        with self._lock:
+            self._connecting -= 1
+            self._open[id(conn)] = created_at
+            self.created += 1
+        return conn, created_at
+
+    def _validate(self, conn: Any, created_at: float):
+        """
+        Replace a connection that is past its recycle age or fails a ping.
+        """
+        reason = None
+        if self.recycle is not None and time.monotonic() - created_at > self.recycle:
+            reason = "recycled"
+        elif self.pre_ping and not self._ping(conn):
+            reason = "ping failed"
+        if reason is None:
+            return conn, created_at
+        logger.debug(f"Replacing pooled database connection ({reason})")
+        with self._lock:
+            if reason == "recycled":
+                self.recycled += 1
+            else:
+                self.ping_failures += 1
+            # The replacement takes over the old connection's slot
+            self._open.pop(id(conn), None)
+            self._connecting += 1
+        self._close_quietly(conn)
+        return self._new_connection()
+
+    @staticmethod
+    def _ping(conn: Any) -> bool:
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, conn: Any):
+        with self._available:
+            self._open.pop(id(conn), None)
+            self._available.notify()
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn: Any):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _release(self, conn: Any, created_at: float):
+        try:
+            # Ends the transaction, and with it the read snapshot, that even a
+            # SELECT opens with autocommit off, so the next checkout sees fresh rows;
+            # a committed connection has nothing to undo and skips the round trip
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception as e:
+            logger.debug(f"Discarding pooled database connection that failed to roll back: {str(e)}")
+            self.reset_failures += 1
+            self._discard(conn)
+            return
+        with self._available:
+            if len(self._idle) < self.size and id(conn) in self._open:
+                self._idle.append((conn, created_at))
+                self._available.notify()
+                return
+        # An overflow connection: close it rather than keep it idle
+        self._discard(conn)
+
+    def close(self):
+        """
+        Close the idle connections; checked-out ones are closed when returned.
+        """
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            ages: List[float] = [now - created_at for created_at in self._open.values()]
+            waits = sorted(self._waits)
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": len(self._open),
+                "idle": len(self._idle),
+                "checked_out": len(self._open) - len(self._idle),
+                "checkouts": self.checkouts,
+                "waited": self.waited,
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "recycled": self.recycled,
+                "ping_failures": self.ping_failures,
+                "reset_failures": self.reset_failures,
+                "wait_p50_seconds": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p95_seconds": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "wait_max_seconds": waits[-1] if waits else 0.0,
+                "connection_age_mean_seconds": sum(ages) / len(ages) if ages else 0.0,
+                "connection_age_max_seconds": max(ages) if ages else 0.0,
+            }
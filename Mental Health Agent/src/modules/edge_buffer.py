@@ -0,0 +1,176 @@
+# src/modules/edge_buffer.py
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .logging_setup import logger
+
+Edge = Tuple[str, str, str, float]
+EdgeKey = Tuple[str, str, str]
+
+class EdgeBuffer:
+    """
+    In-process buffer of knowledge graph edge upserts.
+
+    Edges with the same (source, target, relationship) key are coalesced, the
+    latest strength winning, and written in bulk by a background thread once
+    ``max_size`` keys are pending or every ``flush_interval`` seconds. Edges
+    stay visible through ``pending_for()`` until their write has committed.
+    A failed flush is kept for the next one, up to ``max_pending`` keys.
+    """
+
+    def __init__(self, writer: Callable[[List[Edge]], int], max_size: int = 500, flush_interval: float = 2.0,
+                 max_pending: int = 50000, enabled: bool = True):
+        self.writer = writer
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self._pending: Dict[EdgeKey, float] = {}
+        self._flushing: Dict[EdgeKey, float] = {}
+        # node id -> keys of buffered edges touching it, for reads
+        self._by_node: Dict[str, Set[EdgeKey]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.added = 0
+        self.coalesced = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running or not self.enabled:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="edge-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the background thread after writing everything buffered.
+        """
+        self._stop.set()
+        with self._wake:
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if not self.running:
+            # Edges added while the thread was finishing
+            self.flush()
+
+    def add(self, edges: Iterable[Edge]):
+        if not self.enabled:
+            self.writer(list(edges))
+            return
+        if not self._stop.is_set():
+            self.start()
+        with self._lock:
+            for source_id, target_id, relationship_type, strength in edges:
+                key = (source_id, target_id, relationship_type)
+                self.added += 1
+                if key in self._pending:
+                    self.coalesced += 1
+                self._pending[key] = strength
+                self._index(key)
+            if len(self._pending) >= self.max_size:
+                self._wake.notify()
+
+    def _index(self, key: EdgeKey):
+        self._by_node.setdefault(key[0], set()).add(key)
+        self._by_node.setdefault(key[1], set()).add(key)
+
+    def _unindex(self, key: EdgeKey):
+        for node_id in (key[0], key[1]):
+            keys = self._by_node.get(node_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_node[node_id]
+
+    def pending_for(self, node_id: str, relationship_type: Optional[str] = None) -> List[Tuple[str, str, float]]:
+        """
+        Unwritten edges touching node_id, as (other node, relationship, strength)
+        rows shaped like get_related_nodes results.
+        """
+        with self._lock:
+            rows = []
+            for key in self._by_node.get(node_id, ()):
+                source_id, target_id, edge_type = key
+                if relationship_type and edge_type != relationship_type:
+                    continue
+                strength = self._pending.get(key, self._flushing.get(key))
+                rows.append((target_id if source_id == node_id else source_id, edge_type, strength))
+            return rows
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+            edges = [key + (strength,) for key, strength in self._flushing.items()]
+            try:
+                written = self.writer(edges)
+            except Exception as e:
+                logger.error(f"Error flushing {len(edges)} buffered edges: {str(e)}")
+                self._requeue()
+                return 0
+            with self._lock:
+                for key in self._flushing:
+                    if key not in self._pending:
+                        self._unindex(key)
+                self._flushing = {}
+                self.written += written
+                self.flushes += 1
+            logger.debug(f"Flushed {written} buffered edges")
+            return written
+
+    def _requeue(self):
+        with self._lock:
+            self.failed_flushes += 1
+            if len(self._flushing) + len(self._pending) > self.max_pending:
+                logger.error(f"Dropping {len(self._flushing)} buffered edges after a failed flush; "
+                             f"{len(self._pending)} more are pending")
+                self.dropped += len(self._flushing)
+                for key in self._flushing:
+                    if key not in self._pending:
+                        self._unindex(key)
+            else:
+                # Edges added since the flush started are newer and win
+                for key, strength in self._flushing.items():
+                    self._pending.setdefault(key, strength)
+            self._flushing = {}
+
+    def _run(self):
+        while True:
+            with self._wake:
+                if not self._stop.is_set() and len(self._pending) < self.max_size:
+                    self._wake.wait(self.flush_interval)
+                stopping = self._stop.is_set()
+            self.flush()
+            if stopping:
+                if self._pending:
+                    logger.warning(f"Edge buffer stopped with {len(self._pending)} edges unwritten")
+                break
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending) + len(self._flushing),
+                "added": self.added,
+                "coalesced": self.coalesced,
+                "written": self.written,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "dropped": self.dropped,
+            }
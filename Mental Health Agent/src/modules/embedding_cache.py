@@ -0,0 +1,162 @@
+# src/modules/embedding_cache.py
+
+import time
+import atexit
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
+from .caching import LRUCache
+from .logging_setup import logger
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed by (embedding model, normalized text).
+
+    The memory tier is a bounded LRU; the optional disk tier is a SQLite file
+    that survives restarts, capped at ``max_rows`` rows (oldest written are
+    deleted first, every ``prune_every`` writes). Disk writes are committed in
+    groups of ``commit_every`` or after ``commit_interval`` seconds, so a crash
+    can lose the last few entries. Disk hits are promoted into the memory tier.
+    """
+
+    def __init__(self, max_size: int = 1024, path: Optional[Path] = None, max_rows: int = 50000,
+                 prune_every: int = 100, commit_every: int = 32, commit_interval: float = 5.0):
+        self.memory = LRUCache(max_size)
+        self.path = Path(path) if path else None
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self._writes = 0
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.path:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening embedding cache {self.path}, disk tier disabled: {str(e)}")
+                self._conn = None
+            else:
+                self.prune()
+                atexit.register(self.flush)
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode()).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.key(model, text)
+        vector = self.memory.get(key)
+        if vector is not None or self._conn is None:
+            return vector
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+        self.disk_hits += 1
+        self.memory.set(key, vector)
+        return vector
+
+    def set(self, model: str, text: str, vector: List[float]):
+        key = self.key(model, text)
+        self.memory.set(key, vector)
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    (key, model, np.asarray(vector, dtype=np.float32).tobytes()),
+                )
+                self._writes += 1
+                self._uncommitted += 1
+                if (self._uncommitted >= self.commit_every
+                        or time.monotonic() - self._committed_at > self.commit_interval):
+                    self._commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing embedding cache entry: {str(e)}")
+            return
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def _commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+
+    def flush(self):
+        """
+        Commit disk writes still pending.
+        """
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                if self._uncommitted:
+                    self._commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error committing embedding cache: {str(e)}")
+
+    def prune(self) -> int:
+        """
+        Delete the oldest disk rows past max_rows.
+        """
+        if self._conn is None:
+            return 0
+        try:
+            with self._lock:
+                # INSERT OR REPLACE gives a rewritten entry a new rowid, so rowid order is write order
+                evicted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                ).rowcount
+                self._commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error pruning embedding cache: {str(e)}")
+            return 0
+        self.disk_evictions += evicted
+        if evicted:
+            logger.debug(f"Pruned {evicted} old embedding cache rows")
+        return evicted
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """
+        Return the cached embedding, or compute it and cache it. Lookups are keyed
+        on the normalized text, but the embedding is computed from the text as given.
+        """
+        vector = self.get(model, text)
+        if vector is None:
+            vector = compute(text)
+            self.set(model, text, vector)
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        misses = memory["misses"] - self.disk_hits
+        return {
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": misses,
+            "hit_rate": (lookups - misses) / lookups if lookups else 0.0,
+            "memory_size": memory["size"],
+            "evictions": memory["evictions"],
+            "disk_evictions": self.disk_evictions,
+        }
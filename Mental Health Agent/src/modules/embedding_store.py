@@ -0,0 +1,194 @@
+# src/modules/embedding_store.py
+
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Iterable
+from .file_utils import read_json_file, write_json_file, ensure_directory_exists, get_json_files_in_directory
+from .logging_setup import logger
+from .errors import FileOperationError
+
+MANIFEST_FILE = "manifest.json"
+IDS_FILE = "ids.txt"
+
+class EmbeddingStore:
+    """
+    Segment-based binary store for embedding vectors.
+
+    Vectors are written into fixed-size float32 ``.npy`` segments that are opened
+    with ``np.memmap``, so every process reading the store shares the page cache.
+    ``ids.txt`` is the id manifest: line ``n`` names row ``n`` across the
+    concatenated segments. A row is only visible once its id line is written,
+    which keeps a half-finished append invisible to readers. Only one process
+    should append to a given store.
+    """
+
+    def __init__(self, directory: Path, segment_size: int = 1024):
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.dimension: Optional[int] = None
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._segments: Dict[int, np.memmap] = {}
+        self._ids_offset = 0
+        self._opened = False
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"segment_{segment:05d}.npy"
+
+    def _open(self):
+        if self._opened:
+            return
+        ensure_directory_exists(self.directory)
+        manifest_path = self.directory / MANIFEST_FILE
+        if manifest_path.exists():
+            manifest = read_json_file(manifest_path)
+            self.dimension = manifest["dimension"]
+            self.segment_size = manifest["segment_size"]
+        self._opened = True
+        self.refresh()
+
+    def refresh(self):
+        """
+        Pick up ids appended by other processes since the last read.
+        """
+        with self._lock:
+            ids_path = self.directory / IDS_FILE
+            if not ids_path.exists():
+                return
+            with ids_path.open('r', encoding='utf-8') as f:
+                f.seek(self._ids_offset)
+                for line in iter(f.readline, ''):
+                    if not line.endswith('\n'):
+                        break  # partially written id line
+                    self._ids_offset = f.tell()
+                    memory_id = line[:-1]
+                    if memory_id not in self._positions:
+                        self._positions[memory_id] = len(self._ids)
+                        self._ids.append(memory_id)
+
+    def _segment(self, segment: int, create: bool = False) -> np.memmap:
+        if segment not in self._segments:
+            path = self._segment_path(segment)
+            if path.exists():
+                self._segments[segment] = np.load(path, mmap_mode='r+')
+            elif create:
+                self._segments[segment] = np.lib.format.open_memmap(
+                    path, mode='w+', dtype=np.float32, shape=(self.segment_size, self.dimension)
+                )
+            else:
+                raise FileOperationError(f"Missing embedding segment: {path}")
+        return self._segments[segment]
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._ids)
+
+    def __contains__(self, memory_id: str) -> bool:
+        self._open()
+        return memory_id in self._positions
+
+    def ids(self) -> List[str]:
+        self._open()
+        with self._lock:
+            return list(self._ids)
+
+    def append(self, memory_id: str, vector: Iterable[float]) -> None:
+        self.append_many([(memory_id, vector)])
+
+    def append_many(self, items: Iterable[Tuple[str, Iterable[float]]]) -> int:
+        """
+        Write vectors into the active segment and then record their ids.
+        Existing ids are overwritten in place.
+        """
+        self._open()
+        written = 0
+        with self._lock:
+            new_ids = []
+            pending: Dict[str, int] = {}
+            touched = set()
+            for memory_id, vector in items:
+                row = np.asarray(vector, dtype=np.float32)
+                if self.dimension is None:
+                    self.dimension = int(row.size)
+                    write_json_file(self.directory / MANIFEST_FILE,
+                                    {"dimension": self.dimension, "segment_size": self.segment_size})
+                if row.shape != (self.dimension,):
+                    logger.warning(f"Skipping embedding for {memory_id}: expected dimension {self.dimension}, got {row.size}")
+                    continue
+                position = self._positions.get(memory_id, pending.get(memory_id))
+                if position is None:
+                    position = pending[memory_id] = len(self._ids) + len(new_ids)
+                    new_ids.append(memory_id)
+                segment, offset = divmod(position, self.segment_size)
+                self._segment(segment, create=True)[offset] = row
+                touched.add(segment)
+                written += 1
+            for segment in touched:
+                self._segments[segment].flush()
+            if new_ids:
+                with (self.directory / IDS_FILE).open('a', encoding='utf-8') as f:
+                    f.write(''.join(f"{memory_id}\n" for memory_id in new_ids))
+                self.refresh()
+        return written
+
+    def get(self, memory_id: str) -> Optional[np.ndarray]:
+        self._open()
+        with self._lock:
+            position = self._positions.get(memory_id)
+            if position is None:
+                return None
+            segment, offset = divmod(position, self.segment_size)
+            return np.array(self._segment(segment)[offset])
+
+    def load_all(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Return every stored id and a (n, dimension) float32 matrix of their vectors.
+        """
+        self._open()
+        with self._lock:
+            count = len(self._ids)
+            if count == 0 or self.dimension is None:
+                return [], np.empty((0, 0), dtype=np.float32)
+            parts = []
+            for segment in range((count - 1) // self.segment_size + 1):
+                rows = min(self.segment_size, count - segment * self.segment_size)
+                parts.append(self._segment(segment)[:rows])
+            return list(self._ids), np.concatenate(parts)
+
+    def close(self):
+        """
+        Drop the segment memmaps and the id manifest; the store reopens on next use.
+        """
+        with self._lock:
+            self._segments = {}
+            self._ids = []
+            self._positions = {}
+            self._ids_offset = 0
+            self._opened = False
+
+def convert_json_embeddings(source_dir: Path, store: EmbeddingStore) -> int:
+    """
+    One-shot conversion of a legacy ``<name>.json.json`` embeddings directory into a binary store.
+    """
+    converted = 0
+    batch = []
+    for file_path in sorted(get_json_files_in_directory(source_dir)):
+        if file_path.name == MANIFEST_FILE:
+            continue
+        memory_id = file_path.name[:-len(".json")]
+        if memory_id in store:
+            continue
+        try:
+            batch.append((memory_id, read_json_file(file_path)))
+        except FileOperationError as e:
+            logger.error(f"Skipping unreadable embeddings file {file_path}: {str(e)}")
+            continue
+        if len(batch) >= store.segment_size:
+            converted += store.append_many(batch)
+            batch = []
+    if batch:
+        converted += store.append_many(batch)
+    logger.info(f"Converted {converted} JSON embeddings from {source_dir} into {store.directory}")
+    return converted
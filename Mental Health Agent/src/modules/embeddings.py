@@ -0,0 +1,121 @@
+# src/modules/embeddings.py
+
+import time
+import ollama
+import threading
+from typing import List, Dict, Any
+from config import (EMBEDDINGS_DIR, EMBEDDING_STORE_DIR, EMBEDDING_SEGMENT_SIZE, EMBEDDING_MODEL,
+                    EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_DISK_SIZE,
+                    EMBEDDING_BATCH_SIZE)
+from .file_utils import read_json_file
+from .logging_setup import logger
+from .embedding_store import EmbeddingStore
+from .embedding_cache import EmbeddingCache
+
+def memory_text(memory_data: Dict[str, Any]) -> str:
+    """
+    Build the text that gets embedded for a memory entry.
+    """
+    if 'type' not in memory_data:
+        return str(memory_data)
+    if memory_data['type'] == 'interaction':
+        content = memory_data['content']
+        if isinstance(content, dict) and 'prompt' in content and 'response' in content:
+            return f"{content['prompt']}\n{content['response']}"
+    # document_chunk or any other type
+    return str(memory_data['content'])
+
+def embed_text(text: str) -> List[float]:
+    return ollama.embeddings(model=EMBEDDING_MODEL, prompt=text)["embedding"]
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed several texts with a single request to Ollama's multi-input embed endpoint.
+    """
+    if not texts:
+        return []
+    return ollama.embed(model=EMBEDDING_MODEL, input=texts)["embeddings"]
+
+class EmbeddingThroughput:
+    """
+    Running totals for batched embedding calls, used to size EMBEDDING_BATCH_SIZE.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.requests = 0
+        self.seconds = 0.0
+        self.last_texts_per_second = 0.0
+
+    def record(self, texts: int, requests: int, seconds: float):
+        with self._lock:
+            self.texts += texts
+            self.requests += requests
+            self.seconds += seconds
+            self.last_texts_per_second = texts / seconds if seconds > 0 else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "texts": self.texts,
+                "requests": self.requests,
+                "seconds": self.seconds,
+                "texts_per_second": self.texts / self.seconds if self.seconds > 0 else 0.0,
+                "last_texts_per_second": self.last_texts_per_second,
+            }
+
+embedding_throughput = EmbeddingThroughput()
+
+def embed_batch(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> List[List[float]]:
+    """
+    Embed any number of texts, batch_size texts per request, in input order.
+    """
+    vectors: List[List[float]] = []
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embed_texts(texts[start:start + batch_size]))
+    elapsed = time.perf_counter() - started
+    if texts:
+        requests = (len(texts) + batch_size - 1) // batch_size
+        embedding_throughput.record(len(texts), requests, elapsed)
+        logger.info(f"Embedded {len(texts)} texts in {requests} requests "
+                    f"({embedding_throughput.last_texts_per_second:.1f} texts/s)")
+    return vectors
+
+query_cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_FILE or None, EMBEDDING_CACHE_DISK_SIZE)
+
+def embed_query(query: str) -> List[float]:
+    """
+    Embed a search query, reusing cached vectors for repeated queries.
+    """
+    return query_cache.get_or_compute(EMBEDDING_MODEL, query, embed_text)
+
+embedding_store = EmbeddingStore(EMBEDDING_STORE_DIR, EMBEDDING_SEGMENT_SIZE)
+
+def save_embeddings(filename: str, embeddings: List[float]) -> None:
+    try:
+        embedding_store.append(filename, embeddings)
+        logger.info(f"Saved embeddings for file: {filename}")
+    except Exception as e:
+        logger.error(f"Error saving embeddings for file {filename}: {str(e)}")
+
+def load_embeddings(filename: str) -> List[float]:
+    try:
+        if (vector := embedding_store.get(filename)) is not None:
+            return vector.tolist()
+    except Exception as e:
+        logger.error(f"Error loading embeddings for file {filename}: {str(e)}")
+        return []
+    # Fall back to the legacy JSON layout and migrate the vector on first use
+    embeddings_file = EMBEDDINGS_DIR / f"{filename}.json"
+    if not embeddings_file.exists():
+        logger.debug(f"No existing embeddings found for file: {filename}")
+        return []
+    try:
+        embeddings = read_json_file(embeddings_file)
+    except Exception as e:
+        logger.error(f"Error loading embeddings for file {filename}: {str(e)}")
+        return []
+    save_embeddings(filename, embeddings)
+    return embeddings
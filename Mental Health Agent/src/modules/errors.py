@@ -26,4 +26,10 @@ class ModelInferenceError(OllamaAgentsError):
     """Raised when there's an error during model inference"""
 
 class DataProcessingError(OllamaAgentsError):
-    """Raised when there's an error processing data"""
\ No newline at end of file
+    """Raised when there's an error processing data"""
+
+class OverloadedError(APIConnectionError):
+    """Raised when the Ollama request queue is too deep to accept more work"""
+
+class PoolTimeoutError(OllamaAgentsError):
+    """Raised when no pooled database connection becomes free in time"""
@@ -0,0 +1,343 @@
+# src/modules/graph_traversal.py
+
+import time
+import threading
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from .logging_setup import logger
+
+# (source_id, target_id, relationship_type, strength, confidence)
+EdgeRow = Tuple[str, str, str, float, float]
+
+class GraphSnapshot:
+    """
+    Compressed sparse row adjacency of the edges table.
+
+    Edges are walked in both directions, like get_related_nodes, with weight
+    strength * confidence. Each node's neighbours are sorted by descending
+    weight so fan-out limits keep the strongest edges.
+    """
+
+    def __init__(self, rows: Iterable[EdgeRow]):
+        self.built_at = time.monotonic()
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.relationships: List[str] = []
+        relationship_index: Dict[str, int] = {}
+        sources, targets, weights, kinds = [], [], [], []
+        for source_id, target_id, relationship_type, strength, confidence in rows:
+            source, target = self._node(source_id), self._node(target_id)
+            kind = relationship_index.setdefault(relationship_type, len(relationship_index))
+            weight = float(strength) * float(1.0 if confidence is None else confidence)
+            sources += [source, target]
+            targets += [target, source]
+            weights += [weight, weight]
+            kinds += [kind, kind]
+        self.relationships = list(relationship_index)
+        self.edge_count = len(sources) // 2
+
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.lexsort((-np.asarray(weights, dtype=np.float64), sources))
+        self.sources = sources[order]
+        self.indices = np.asarray(targets, dtype=np.int64)[order]
+        self.weights = np.asarray(weights, dtype=np.float64)[order]
+        self.kinds = np.asarray(kinds, dtype=np.int32)[order]
+        self.indptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=len(self.ids)), out=self.indptr[1:])
+
+    def _node(self, node_id: str) -> int:
+        if node_id not in self.index:
+            self.index[node_id] = len(self.ids)
+            self.ids.append(node_id)
+        return self.index[node_id]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def edge_mask(self, relationship_types: Optional[Sequence[str]], min_weight: float) -> np.ndarray:
+        mask = self.weights >= min_weight
+        if relationship_types:
+            relationship_types = set(relationship_types)
+            wanted = [i for i, name in enumerate(self.relationships) if name in relationship_types]
+            mask &= np.isin(self.kinds, wanted)
+        return mask
+
+    def bfs(self, seeds: Sequence[str], max_depth: int, max_fanout: int, relationship_types: Optional[Sequence[str]],
+            min_weight: float, deadline: float) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Breadth-first expansion from the seeds. A node's score is the best
+        product of edge weights over the paths that reached it first.
+        """
+        mask = self.edge_mask(relationship_types, min_weight)
+        best: Dict[int, Dict[str, Any]] = {}
+        frontier = []
+        for seed in seeds:
+            if seed in self.index:
+                node = self.index[seed]
+                best[node] = {"node_id": seed, "depth": 0, "score": 1.0, "via": None, "relationship": None}
+                frontier.append(node)
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for node in frontier:
+                if time.monotonic() > deadline:
+                    return list(best.values()), True
+                start, end = self.indptr[node], self.indptr[node + 1]
+                taken = 0
+                for edge in range(start, end):
+                    if taken >= max_fanout:
+                        break
+                    if not mask[edge]:
+                        continue
+                    taken += 1
+                    neighbour = int(self.indices[edge])
+                    score = best[node]["score"] * self.weights[edge]
+                    seen = best.get(neighbour)
+                    if seen is None:
+                        next_frontier.append(neighbour)
+                    elif seen["depth"] < depth or seen["score"] >= score:
+                        continue
+                    best[neighbour] = {"node_id": self.ids[neighbour], "depth": depth, "score": float(score),
+                                       "via": self.ids[node], "relationship": self.relationships[self.kinds[edge]]}
+            frontier = next_frontier
+            if not frontier:
+                break
+        return list(best.values()), False
+
+    def personalized_pagerank(self, seeds: Sequence[str], damping: float, iterations: int, tolerance: float,
+                              relationship_types: Optional[Sequence[str]], min_weight: float,
+                              deadline: float) -> Tuple[np.ndarray, int, bool]:
+        """
+        Power iteration of PageRank restarting at the seeds, over weight-normalised
+        out-edges. Mass from nodes without usable edges returns to the seeds.
+        """
+        n = len(self.ids)
+        personalization = np.zeros(n)
+        for seed in seeds:
+            if seed in self.index:
+                personalization[self.index[seed]] = 1.0
+        if not personalization.any():
+            return personalization, 0, False
+        personalization /= personalization.sum()
+
+        weights = np.where(self.edge_mask(relationship_types, min_weight), self.weights, 0.0)
+        out_weight = np.bincount(self.sources, weights=weights, minlength=n)
+        normalised = np.divide(weights, out_weight[self.sources], out=np.zeros_like(weights),
+                               where=out_weight[self.sources] > 0)
+        dangling = out_weight == 0
+
+        rank = personalization.copy()
+        iteration = 0
+        for iteration in range(1, iterations + 1):
+            if time.monotonic() > deadline:
+                return rank, iteration - 1, True
+            spread = np.bincount(self.indices, weights=rank[self.sources] * normalised, minlength=n)
+            updated = damping * (spread + rank[dangling].sum() * personalization) + (1 - damping) * personalization
+            change = np.abs(updated - rank).sum()
+            rank = updated
+            if change < tolerance:
+                break
+        return rank, iteration, False
+
+class GraphTraversal:
+    """
+    Multi-hop traversal of the knowledge graph within a time budget.
+
+    Graphs of up to ``max_snapshot_edges`` edges are walked over an in-memory
+    CSR snapshot. The edges table is loaded once (and again every
+    ``snapshot_ttl`` seconds); flushed edges are applied to the loaded edge set
+    and the snapshot is rebuilt from it in the background, at most every
+    ``min_refresh_interval`` seconds, while the old one keeps serving. Larger
+    graphs (and lookups before the first snapshot is ready) load the seeds'
+    neighbourhood with a recursive CTE, bounded by the same budget, and walk
+    that instead. Edges still in the write buffer are not part of either until
+    they are flushed.
+    """
+
+    def __init__(self, count_edges: Callable[[], int], load_edges: Callable[[], List[EdgeRow]],
+                 load_neighbourhood: Callable[[Sequence[str], int, Optional[Sequence[str]], float, float], List[EdgeRow]],
+                 max_snapshot_edges: int = 500000, snapshot_ttl: float = 300, min_refresh_interval: float = 30,
+                 time_budget: float = 0.25):
+        self.count_edges = count_edges
+        self.load_edges = load_edges
+        self.load_neighbourhood = load_neighbourhood
+        self.max_snapshot_edges = max_snapshot_edges
+        self.snapshot_ttl = snapshot_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.time_budget = time_budget
+        self.snapshot: Optional[GraphSnapshot] = None
+        # (source_id, target_id, relationship_type) -> (strength, confidence) behind the snapshot;
+        # None while the table is not loaded or too big to hold
+        self._rows: Optional[Dict[Tuple[str, str, str], Tuple[float, float]]] = None
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.loaded_at: Optional[float] = None
+        self.rebuilt_at = 0.0
+        self.edge_count: Optional[int] = None
+        self.queries: Dict[str, int] = {"csr": 0, "sql": 0}
+        self.refreshes: Dict[str, int] = {"load": 0, "rebuild": 0}
+        self.truncated = 0
+
+    def apply(self, edges: Iterable[Tuple[str, str, str, float]]):
+        """
+        Record (source_id, target_id, relationship_type, strength) edges that
+        were written to the table, for the next background rebuild.
+        """
+        with self._lock:
+            # Nothing to keep up to date when traversals read the table itself
+            if self._rows is None and not self._refreshing:
+                return
+            self._pending.extend(edges)
+            self._dirty = True
+
+    def _snapshot(self) -> Optional[GraphSnapshot]:
+        """
+        The current snapshot, starting a background load or rebuild when it is out of date.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing:
+                return self.snapshot
+            if self.loaded_at is None or now - self.loaded_at > self.snapshot_ttl:
+                target = self._load
+            elif self._dirty and self._rows is not None and now - self.rebuilt_at > self.min_refresh_interval:
+                target = self._rebuild
+            else:
+                return self.snapshot
+            self._refreshing = True
+        threading.Thread(target=target, name="graph-snapshot", daemon=True).start()
+        return self.snapshot
+
+    def _load(self):
+        """
+        Load the whole edges table, then build the snapshot from it.
+        """
+        try:
+            self.loaded_at = time.monotonic()
+            self.refreshes["load"] += 1
+            self.edge_count = self.count_edges()
+            if self.edge_count > self.max_snapshot_edges:
+                # Too big to hold in memory; traversals use the recursive CTE
+                self._drop()
+                return
+            rows = {(source_id, target_id, relationship_type): (strength, confidence)
+                    for source_id, target_id, relationship_type, strength, confidence in self.load_edges()}
+            with self._lock:
+                # Edges applied while the table was read are replayed over it, which is idempotent
+                self._rows = rows
+            self._build()
+        except Exception as e:
+            logger.error(f"Error loading graph snapshot: {str(e)}")
+            # Retry after the refresh interval rather than on the next traversal
+            self.loaded_at = time.monotonic() - self.snapshot_ttl + self.min_refresh_interval
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _rebuild(self):
+        try:
+            self.refreshes["rebuild"] += 1
+            self._build()
+        except Exception as e:
+            logger.error(f"Error rebuilding graph snapshot: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _build(self):
+        with self._lock:
+            rows, pending = self._rows, self._pending
+            self._pending, self._dirty = [], False
+            for source_id, target_id, relationship_type, strength in pending:
+                # Writes upsert the strength only; new edges take the column's default confidence
+                key = (source_id, target_id, relationship_type)
+                rows[key] = (strength, rows[key][1] if key in rows else 1.0)
+            edge_count = len(rows)
+            rows = [(*key, strength, confidence) for key, (strength, confidence) in rows.items()]
+        if edge_count > self.max_snapshot_edges:
+            logger.info(f"Graph grew to {edge_count} edges; traversals switch to the recursive CTE")
+            self._drop()
+            return
+        started = time.perf_counter()
+        self.snapshot = GraphSnapshot(rows)
+        self.edge_count = edge_count
+        self.rebuilt_at = time.monotonic()
+        logger.info(f"Built graph snapshot of {len(self.snapshot)} nodes and {self.snapshot.edge_count} edges "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    def _drop(self):
+        with self._lock:
+            self._rows, self._pending, self._dirty = None, [], False
+        self.snapshot = None
+
+    def _graph(self, seeds: Sequence[str], max_depth: int, relationship_types: Optional[Sequence[str]],
+               min_weight: float, deadline: float) -> Tuple[Optional[GraphSnapshot], str]:
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            self.queries["csr"] += 1
+            return snapshot, "csr"
+        self.queries["sql"] += 1
+        remaining = max(deadline - time.monotonic(), 0.0)
+        try:
+            rows = self.load_neighbourhood(seeds, max_depth, relationship_types, min_weight, remaining)
+        except Exception as e:
+            logger.warning(f"Graph neighbourhood query failed or ran out of time: {str(e)}")
+            return None, "sql"
+        return GraphSnapshot(rows), "sql"
+
+    def bfs(self, seeds: Sequence[str], max_depth: int = 2, max_fanout: int = 25,
+            relationship_types: Optional[Sequence[str]] = None, min_weight: float = 0.0,
+            time_budget: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Nodes within max_depth hops of the seeds, following at most max_fanout of
+        each node's strongest edges, ordered by depth then path score.
+        """
+        started = time.monotonic()
+        deadline = started + (self.time_budget if time_budget is None else time_budget)
+        graph, backend = self._graph(seeds, max_depth, relationship_types, min_weight, deadline)
+        if graph is None:
+            nodes, truncated = [], True
+        else:
+            nodes, truncated = graph.bfs(seeds, max_depth, max_fanout, relationship_types, min_weight, deadline)
+        nodes.sort(key=lambda node: (node["depth"], -node["score"]))
+        return self._result(backend, truncated, started, nodes=nodes)
+
+    def personalized_pagerank(self, seeds: Sequence[str], top_k: int = 20, damping: float = 0.85,
+                              iterations: int = 30, tolerance: float = 1e-6, max_depth: int = 3,
+                              relationship_types: Optional[Sequence[str]] = None, min_weight: float = 0.0,
+                              include_seeds: bool = False, time_budget: Optional[float] = None) -> Dict[str, Any]:
+        """
+        The top_k nodes by PageRank personalised to the seeds. max_depth bounds
+        the neighbourhood loaded when the graph is too large for a snapshot.
+        """
+        started = time.monotonic()
+        deadline = started + (self.time_budget if time_budget is None else time_budget)
+        graph, backend = self._graph(seeds, max_depth, relationship_types, min_weight, deadline)
+        if graph is None:
+            return self._result(backend, True, started, nodes=[], iterations=0)
+        rank, iterations, truncated = graph.personalized_pagerank(
+            seeds, damping, iterations, tolerance, relationship_types, min_weight, deadline)
+        if not include_seeds:
+            for seed in seeds:
+                if seed in graph.index:
+                    rank[graph.index[seed]] = 0.0
+        top = np.argsort(-rank)[:top_k]
+        nodes = [{"node_id": graph.ids[i], "score": float(rank[i])} for i in top if rank[i] > 0]
+        return self._result(backend, truncated, started, nodes=nodes, iterations=iterations)
+
+    def _result(self, backend: str, truncated: bool, started: float, **fields) -> Dict[str, Any]:
+        if truncated:
+            self.truncated += 1
+        return {"backend": backend, "truncated": truncated, "elapsed_seconds": time.monotonic() - started, **fields}
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {
+            "edge_count": self.edge_count,
+            "snapshot_nodes": len(snapshot) if snapshot is not None else None,
+            "snapshot_age_seconds": time.monotonic() - snapshot.built_at if snapshot is not None else None,
+            "queries": dict(self.queries),
+            "refreshes": dict(self.refreshes),
+            "truncated": self.truncated,
+        }
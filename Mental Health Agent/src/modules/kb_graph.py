@@ -1,13 +1,20 @@
 import json
+import atexit
 import hashlib
 import mysql.connector
-from pathlib import Path
-from typing import Dict, Any, List, Tuple, Union, Optional
-from collections import Counter
+from typing import Dict, Any, Iterable, List, Tuple, Union, Optional
 import re
 from datetime import datetime
 from dotenv import load_dotenv
 import os
+from config import (DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT, EDGE_BATCH_SIZE,
+                    EDGE_BUFFER_ENABLED, EDGE_BUFFER_MAX_SIZE, EDGE_FLUSH_INTERVAL,
+                    NEIGHBOR_CACHE_SIZE, NEIGHBOR_CACHE_TTL, GRAPH_SNAPSHOT_MAX_EDGES, GRAPH_SNAPSHOT_TTL,
+                    GRAPH_SNAPSHOT_REFRESH, GRAPH_TIME_BUDGET)
+from src.modules.db_pool import ConnectionPool
+from src.modules.edge_buffer import Edge, EdgeBuffer
+from src.modules.neighbor_cache import NeighborCache
+from src.modules.graph_traversal import EdgeRow, GraphTraversal
 
 load_dotenv()
 
@@ -16,38 +23,64 @@ DB_USER = os.getenv("user")
 DB_PASSWORD = os.getenv("password")
 DB_NAME = os.getenv("database") 
 
-def get_db_connection():
-    conn = mysql.connector.connect(
+def _connect():
+    return mysql.connector.connect(
         host=DB_HOST,
         user=DB_USER,
         password=DB_PASSWORD,
         database=DB_NAME
     )
-    return conn
+
+db_pool = ConnectionPool(_connect, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT)
+neighbor_cache = NeighborCache(NEIGHBOR_CACHE_SIZE, NEIGHBOR_CACHE_TTL)
+
+def get_db_connection():
+    """
+    A connection from the shared pool; closing it (or leaving its with block) returns it to the pool.
+    """
+    return db_pool.connection()
 
 def create_edge(source_id: str, target_id: str, relationship_type: str, strength: float):
+    edge_buffer.add([(source_id, target_id, relationship_type, strength)])
+
+def create_edges(edges: Iterable[Edge], batch_size: int = EDGE_BATCH_SIZE) -> int:
+    """
+    Upsert (source_id, target_id, relationship_type, strength) edges with
+    multi-row INSERTs of up to batch_size rows and a single commit.
+    Returns the number of edges written.
+    """
+    edges = list(edges)
+    if not edges:
+        return 0
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO edges (source_id, target_id, relationship_type, strength)
-            VALUES (%s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE strength = VALUES(strength)
-        ''', (source_id, target_id, relationship_type, strength))
+        for start in range(0, len(edges), batch_size):
+            # executemany turns a plain INSERT into one multi-row VALUES statement
+            cursor.executemany('''
+                INSERT INTO edges (source_id, target_id, relationship_type, strength)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE strength = VALUES(strength)
+            ''', edges[start:start + batch_size])
         conn.commit()
+    neighbor_cache.invalidate(edges)
+    graph_traversal.apply(edges)
+    return len(edges)
+
+# Buffered writes for edges on the hot path; create_edges writes straight through
+edge_buffer = EdgeBuffer(create_edges, EDGE_BUFFER_MAX_SIZE, EDGE_FLUSH_INTERVAL, enabled=EDGE_BUFFER_ENABLED)
+# Registered before the queues that feed it, so it is drained after them at exit
+atexit.register(edge_buffer.stop)
+
+def knowledge_graph_edges(new_information: Union[Dict[str, Any], List[Any], str], info_id: Optional[str] = None) -> List[Edge]:
+    info_id = info_id or hashlib.md5(json.dumps(new_information, sort_keys=True).encode()).hexdigest()
+    edges = [(info_id, concept, "RELATED_TO", 1.0) for concept in extract_key_concepts(new_information)]
+    edges.extend((info_id, related_id, "SIMILAR_TO", similarity)
+                 for related_id, similarity in find_related_information(new_information))
+    return edges
 
 def update_knowledge_graph(new_information: Union[Dict[str, Any], List[Any], str]):
     info_id = hashlib.md5(json.dumps(new_information, sort_keys=True).encode()).hexdigest()
-
-    key_concepts = extract_key_concepts(new_information)
-
-    for concept in key_concepts:
-        create_edge(info_id, concept, "RELATED_TO", 1.0)
-
-    related_info = find_related_information(new_information)
-
-    for related_id, similarity in related_info:
-        create_edge(info_id, related_id, "SIMILAR_TO", similarity)
-
+    edge_buffer.add(knowledge_graph_edges(new_information))
     print(f"Updated knowledge graph with new information (ID: {info_id})")
 
 def extract_key_concepts(information: Union[Dict[str, Any], List[Any], str]) -> List[str]:
@@ -64,6 +97,18 @@ def find_related_information(information: Union[Dict[str, Any], List[Any], str])
     return []
 
 def get_related_nodes(node_id: str, relationship_type: str = None) -> List[Tuple[str, str, float]]:
+    """
+    Neighbours of node_id as (node, relationship, strength), including edges still in the write buffer.
+    Stored neighbourhoods are served from neighbor_cache when possible.
+    """
+    buffered = edge_buffer.pending_for(node_id, relationship_type)
+    rows = neighbor_cache.get(node_id, relationship_type, _query_related_nodes)
+    if not buffered:
+        return rows
+    overridden = {(other_id, edge_type) for other_id, edge_type, _ in buffered}
+    return [row for row in rows if (row[0], row[1]) not in overridden] + buffered
+
+def _query_related_nodes(node_id: str, relationship_type: str = None) -> List[Tuple[str, str, float]]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         if relationship_type:
@@ -88,6 +133,78 @@ def get_related_nodes(node_id: str, relationship_type: str = None) -> List[Tuple
             ''', (node_id, node_id))
         return cursor.fetchall()
 
+def count_edges() -> int:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM edges")
+        return cursor.fetchone()[0]
+
+def _load_edges() -> List[EdgeRow]:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT source_id, target_id, relationship_type, strength, confidence FROM edges")
+        return cursor.fetchall()
+
+def _load_neighbourhood(seeds: List[str], max_depth: int, relationship_types: Optional[List[str]],
+                        min_weight: float, time_budget: float) -> List[EdgeRow]:
+    """
+    Edges touching nodes within max_depth - 1 hops of the seeds, found with a
+    recursive CTE that MySQL aborts once time_budget seconds have passed.
+    """
+    edge_filter = "e.strength * e.confidence >= %s"
+    filter_params: List[Any] = [min_weight]
+    if relationship_types:
+        edge_filter += f" AND e.relationship_type IN ({', '.join(['%s'] * len(relationship_types))})"
+        filter_params += list(relationship_types)
+    # The non-recursive part fixes the column type, so make room for any node id
+    seed_rows = " UNION ".join(["SELECT CAST(%s AS CHAR(255)) AS node_id, 0 AS depth"] * len(seeds))
+    query = f'''
+        WITH RECURSIVE reach (node_id, depth) AS (
+            {seed_rows}
+            UNION
+            SELECT e.target_id, r.depth + 1 FROM reach r JOIN edges e ON e.source_id = r.node_id
+            WHERE r.depth < %s AND {edge_filter}
+            UNION
+            SELECT e.source_id, r.depth + 1 FROM reach r JOIN edges e ON e.target_id = r.node_id
+            WHERE r.depth < %s AND {edge_filter}
+        ),
+        expanded AS (SELECT DISTINCT node_id FROM reach)
+        SELECT e.source_id, e.target_id, e.relationship_type, e.strength, e.confidence
+        FROM edges e JOIN expanded x ON e.source_id = x.node_id WHERE {edge_filter}
+        UNION
+        SELECT e.source_id, e.target_id, e.relationship_type, e.strength, e.confidence
+        FROM edges e JOIN expanded x ON e.target_id = x.node_id WHERE {edge_filter}
+    '''
+    params = (list(seeds) + [max_depth - 1] + filter_params + [max_depth - 1] + filter_params
+              + filter_params + filter_params)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION max_execution_time = %s", (max(int(time_budget * 1000), 1),))
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            # The connection goes back to the pool; do not leave the limit on it
+            cursor.execute("SET SESSION max_execution_time = 0")
+
+graph_traversal = GraphTraversal(count_edges, _load_edges, _load_neighbourhood, GRAPH_SNAPSHOT_MAX_EDGES,
+                                 GRAPH_SNAPSHOT_TTL, GRAPH_SNAPSHOT_REFRESH, GRAPH_TIME_BUDGET)
+
+def traverse(seeds: List[str], max_depth: int = 2, max_fanout: int = 25, relationship_types: Optional[List[str]] = None,
+             min_weight: float = 0.0, time_budget: Optional[float] = None) -> Dict[str, Any]:
+    """
+    k-hop breadth-first traversal from the seed nodes; see GraphTraversal.bfs.
+    """
+    return graph_traversal.bfs(seeds, max_depth, max_fanout, relationship_types, min_weight, time_budget)
+
+def personalized_pagerank(seeds: List[str], top_k: int = 20, relationship_types: Optional[List[str]] = None,
+                          min_weight: float = 0.0, time_budget: Optional[float] = None, **options) -> Dict[str, Any]:
+    """
+    Nodes ranked by PageRank personalised to the seed nodes; see GraphTraversal.personalized_pagerank.
+    """
+    return graph_traversal.personalized_pagerank(seeds, top_k, relationship_types=relationship_types,
+                                                 min_weight=min_weight, time_budget=time_budget, **options)
+
 def analyze_file_pair(file1: Dict[str, Any], file2: Dict[str, Any]) -> List[Tuple[str, float]]:
     edge_categories = []
 
@@ -0,0 +1,98 @@
+# src/modules/lexical_index.py
+
+import re
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.casefold())
+
+class BM25Index:
+    """
+    Incrementally maintained inverted index scored with Okapi BM25.
+
+    Each posting list maps a term to {memory_id: term frequency}. Adding a
+    document only touches the posting lists of its own terms, and re-adding
+    an id replaces its previous text.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._lengths
+
+    def add(self, memory_id: str, text: str):
+        frequencies = Counter(tokenize(text))
+        with self._lock:
+            self.remove(memory_id)
+            for term, count in frequencies.items():
+                self._postings.setdefault(term, {})[memory_id] = count
+            length = sum(frequencies.values())
+            self._lengths[memory_id] = length
+            self._terms[memory_id] = tuple(frequencies)
+            self._total_length += length
+
+    def remove(self, memory_id: str):
+        with self._lock:
+            if memory_id not in self._lengths:
+                return
+            for term in self._terms.pop(memory_id):
+                postings = self._postings[term]
+                postings.pop(memory_id, None)
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(memory_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._lengths = {}
+            self._terms = {}
+            self._total_length = 0
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, str]]:
+        """
+        Return up to top_k (score, memory_id) pairs, best first. Only documents
+        sharing at least one term with the query are scored.
+        """
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+        with self._lock:
+            documents = len(self._lengths)
+            if not documents or not terms:
+                return []
+            average_length = self._total_length / documents or 1.0
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for memory_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[memory_id] / average_length)
+                    scores[memory_id] = scores.get(memory_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(top_k, ((score, memory_id) for memory_id, score in scores.items()))
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[float, str]]:
+    """
+    Fuse several best-first id rankings; each list contributes 1 / (k + rank) per id.
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, memory_id in enumerate(ranking, start=1):
+            fused[memory_id] = fused.get(memory_id, 0.0) + 1.0 / (k + rank)
+    return sorted(((score, memory_id) for memory_id, score in fused.items()), reverse=True)
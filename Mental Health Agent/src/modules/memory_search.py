@@ -1,60 +1,39 @@
 
 import numpy as np
-from numpy.linalg import norm
-import ollama
 import json
-from typing import List, Tuple, Dict, Any
-from pathlib import Path
-from config import DATA_DIR, EMBEDDINGS_DIR, EMBEDDING_MODEL, DEFAULT_MODEL
-from .file_utils import read_json_file, write_json_file, get_json_files_in_directory, increment_json_field
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import List, Tuple, Dict, Any, Optional
+from config import DEFAULT_MODEL, SEARCH_MODE, SEARCH_EMBEDDING_TIMEOUT, RRF_K, LEXICAL_MIN_SCORE
 from .logging_setup import logger
+from .embeddings import memory_text, embed_text, embed_query, save_embeddings, load_embeddings
+from .vector_index import VectorIndex, memory_metadata, normalize, top_k_scores
+from .lexical_index import reciprocal_rank_fusion
+from .backfill import embedding_backfill
+from .access_stats import access_stats
+from .partitions import MemoryPartition, partitions
 from .ollama_client import process_prompt
-from src.modules.kb_graph import get_related_nodes, get_db_connection
 
-def read_memory(filename: str) -> Dict[str, Any]:
-    file_path = DATA_DIR / filename
+def read_memory(filename: str, user_id: Optional[str] = None) -> Dict[str, Any]:
     try:
-        data = read_json_file(file_path)
-        increment_json_field(file_path, 'access_count')
+        with partitions.use(user_id) as partition:
+            data = partition.memory_store.get(filename)
+        if data is None:
+            logger.debug(f"No memory found with id: {filename}")
+            return {}
+        data['access_count'] = access_stats.record_access(filename, data.get('access_count', 0))
         logger.debug(f"Read memory: {filename}, access count: {data['access_count']}")
         return data
     except Exception as e:
-        logger.error(f"Error reading memory file {filename}: {str(e)}")
+        logger.error(f"Error reading memory {filename}: {str(e)}")
         return {}
 
-def save_embeddings(filename: str, embeddings: List[float]) -> None:
-    try:
-        write_json_file(EMBEDDINGS_DIR / f"{filename}.json", embeddings)
-        logger.info(f"Saved embeddings for file: {filename}")
-    except Exception as e:
-        logger.error(f"Error saving embeddings for file {filename}: {str(e)}")
-
-def load_embeddings(filename: str) -> List[float]:
-    embeddings_file = EMBEDDINGS_DIR / f"{filename}.json"
-    if not embeddings_file.exists():
-        logger.debug(f"No existing embeddings found for file: {filename}")
-        return []
-    try:
-        return read_json_file(embeddings_file)
-    except Exception as e:
-        logger.error(f"Error loading embeddings for file {filename}: {str(e)}")
-        return []
-
 def get_embeddings(filename: str) -> List[float]:
     if embeddings := load_embeddings(filename):
         return embeddings
     memory_data = read_memory(filename)
-    if 'type' not in memory_data:
-        text = str(memory_data)
-    elif memory_data['type'] == 'interaction':
-        if isinstance(memory_data['content'], dict) and 'prompt' in memory_data['content'] and 'response' in memory_data['content']:
-            text = f"{memory_data['content']['prompt']}\n{memory_data['content']['response']}"
-        else:
-            text = str(memory_data['content'])
-    else:  # document_chunk or any other type
-        text = str(memory_data['content'])
+    text = memory_text(memory_data)
     try:
-        embeddings = ollama.embeddings(model=EMBEDDING_MODEL, prompt=text)["embedding"]
+        embeddings = embed_text(text)
         save_embeddings(filename, embeddings)
         logger.info(f"Generated new embeddings for file: {filename}")
         return embeddings
@@ -62,72 +41,125 @@ def get_embeddings(filename: str) -> List[float]:
         logger.error(f"Error generating embeddings for file {filename}: {str(e)}")
         return []
 
-def find_most_similar(needle: List[float], haystack: List[List[float]]) -> List[Tuple[float, int]]:
+def load_memory_index(user_id: Optional[str] = None) -> VectorIndex:
+    """
+    Return the resident vector index of the user's partition, building it on first use.
+    New memories are appended by save_memory, so later searches never rescan the store.
+    """
+    with partitions.use(user_id) as partition:
+        return partition.ensure_loaded()
+
+def find_most_similar(needle: List[float], haystack: List[List[float]], top_k: Optional[int] = None) -> List[Tuple[float, int]]:
     try:
-        needle_norm = norm(needle)
-        similarity_scores = [
-            np.dot(needle, item) / (needle_norm * norm(item)) for item in haystack
-        ]
-        return sorted(zip(similarity_scores, range(len(haystack))), reverse=True)
+        matrix = np.asarray(haystack, dtype=np.float32)
+        if matrix.size == 0:
+            return []
+        similarity_scores = normalize(matrix) @ normalize(needle)
+        return top_k_scores(similarity_scores, top_k)
     except Exception as e:
         logger.error(f"Error in finding most similar embeddings: {str(e)}")
         return []
 
-def search_memories(query: str, top_k: int = 5, similarity_threshold: float = 0.0) -> List[Dict[str, Any]]:
-    logger.info(f"Searching memories for query: {query[:50]}...")  # Log only first 50 characters
+_query_embedder = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-embedding")
 
-    # Embedding-based search
-    memory_files = get_json_files_in_directory(DATA_DIR)
-    embeddings = [get_embeddings(f.name) for f in memory_files]
+def _query_embedding(query: str) -> Optional[List[float]]:
+    """
+    Embed the query within SEARCH_EMBEDDING_TIMEOUT; None makes the search lexical-only.
+    A request that times out keeps running and still fills the query cache for next time.
+    """
+    future = _query_embedder.submit(embed_query, query)
     try:
-        query_embedding = ollama.embeddings(model=EMBEDDING_MODEL, prompt=query)["embedding"]
-        most_similar_files = find_most_similar(query_embedding, embeddings)
+        return future.result(timeout=SEARCH_EMBEDDING_TIMEOUT)
+    except FuturesTimeoutError:
+        logger.warning(f"Query embedding took longer than {SEARCH_EMBEDDING_TIMEOUT}s, falling back to lexical search")
     except Exception as e:
-        logger.error(f"Error generating query embedding: {str(e)}")
-        most_similar_files = []
-
+        logger.error(f"Error generating query embedding, falling back to lexical search: {str(e)}")
+    return None
+
+def _memory_result(partition: MemoryPartition, memory_id: str) -> Dict[str, Any]:
+    # Vector hits are served from the index metadata; memories not embedded yet
+    # are only in the BM25 index, so their metadata is read from the store
+    memory_data = partition.index.get_metadata(memory_id)
+    if not memory_data:
+        memory_data = memory_metadata(partition.memory_store.get(memory_id) or {})
+    return {
+        "content": memory_data.get("content", ""),
+        "type": memory_data.get("type", "unknown"),
+        "timestamp": memory_data.get("timestamp", ""),
+        "access_count": access_stats.record_access(memory_id, memory_data.get("access_count", 0)),
+        "permanent_marker": memory_data.get("permanent_marker", 0),
+        "filename": memory_id,
+    }
+
+def _embedding_results(partition: MemoryPartition, hits: List[Tuple[float, str]], top_k: int, similarity_threshold: float) -> List[Dict[str, Any]]:
     relevant_memories = []
-    for similarity, index in most_similar_files:
+    for similarity, filename in hits[:top_k]:
         if similarity < similarity_threshold:
             break
-        if len(relevant_memories) >= top_k:
-            break
-        filename = memory_files[index].name
-        memory_data = read_memory(filename)
-
-        relevant_memories.append({
-            "content": memory_data.get("content", ""),
-            "type": memory_data.get("type", "unknown"),
-            "similarity": similarity,
-            "timestamp": memory_data.get("timestamp", ""),
-            "access_count": memory_data.get("access_count", 0),
-            "permanent_marker": memory_data.get("permanent_marker", 0),
-            "filename": filename,
-            "source": "embedding"
-        })
+        result = _memory_result(partition, filename)
+        result.update({"similarity": similarity, "source": "embedding"})
+        relevant_memories.append(result)
+    return relevant_memories
 
-    # Edge-based search
-    query_id = hash(query)  # Using a simple hash for demonstration; you might want a more robust method
-    edge_results = get_related_nodes(str(query_id))
+def search_memories(query: str, top_k: int = 5, similarity_threshold: float = 0.0, user_id: Optional[str] = None,
+                    mode: str = SEARCH_MODE) -> List[Dict[str, Any]]:
+    """
+    Hybrid retrieval over the user's partition: BM25 and vector rankings are
+    fused with reciprocal rank fusion. similarity_threshold applies to every
+    result's cosine similarity to the query; results without one (memories not
+    embedded yet, or no query embedding) must instead reach LEXICAL_MIN_SCORE
+    in BM25. mode "lexical" skips the embedding request entirely, and a failed
+    or slow embedding degrades to lexical-only.
+    """
+    logger.info(f"Searching memories for query: {query[:50]}...")  # Log only first 50 characters
 
-    for node_id, relationship_type, strength in edge_results:
-        if len(relevant_memories) >= top_k * 2:  # Allowing more results to combine later
-            break
-        memory_data = read_memory(f"{node_id}.json")
-        relevant_memories.append({
-            "content": memory_data.get("content", ""),
-            "type": memory_data.get("type", "unknown"),
-            "similarity": strength,  # Using edge strength as a proxy for similarity
-            "timestamp": memory_data.get("timestamp", ""),
-            "access_count": memory_data.get("access_count", 0),
-            "permanent_marker": memory_data.get("permanent_marker", 0),
-            "filename": f"{node_id}.json",
-            "source": "edge",
-            "relationship": relationship_type
-        })
+    with partitions.use(user_id) as partition:
+        return _search_partition(partition, query, top_k, similarity_threshold, mode)
+
+def _search_partition(partition: MemoryPartition, query: str, top_k: int, similarity_threshold: float,
+                      mode: str) -> List[Dict[str, Any]]:
+    partition.ensure_loaded()
+    candidates = top_k * 4
+
+    vector_hits = []
+    query_embedding = None
+    if mode != "lexical" and len(partition.index):
+        query_embedding = _query_embedding(query)
+        if query_embedding is not None:
+            vector_hits = [hit for hit in partition.index.search(query_embedding, candidates) if hit[0] >= similarity_threshold]
+    lexical_hits = partition.lexical.search(query, candidates) if mode != "vector" else []
+
+    vector_ids = {memory_id for _, memory_id in vector_hits}
+    similarities = {memory_id: similarity for similarity, memory_id in vector_hits}
+    lexical_scores = {memory_id: score for score, memory_id in lexical_hits}
+    if query_embedding is not None:
+        # Lexical hits outside the vector candidates are held to the same threshold
+        similarities.update(partition.index.similarities(
+            query_embedding, [memory_id for _, memory_id in lexical_hits if memory_id not in vector_ids]))
+    fused = reciprocal_rank_fusion(
+        [[memory_id for _, memory_id in vector_hits], [memory_id for _, memory_id in lexical_hits]], RRF_K
+    )
+    if similarity_threshold > 0:
+        fused = [
+            (score, memory_id) for score, memory_id in fused
+            if (similarities[memory_id] >= similarity_threshold if memory_id in similarities
+                else lexical_scores.get(memory_id, 0.0) >= LEXICAL_MIN_SCORE)
+        ]
 
-    # Combine and rank results
-    combined_results = sorted(relevant_memories, key=lambda x: x['similarity'], reverse=True)[:top_k]
+    combined_results = []
+    for score, memory_id in fused[:top_k]:
+        result = _memory_result(partition, memory_id)
+        if memory_id in vector_ids and memory_id in lexical_scores:
+            source = "hybrid"
+        else:
+            source = "embedding" if memory_id in vector_ids else "lexical"
+        result.update({
+            "similarity": similarities.get(memory_id, 0.0),
+            "bm25": lexical_scores.get(memory_id, 0.0),
+            "score": score,
+            "source": source,
+        })
+        combined_results.append(result)
 
     logger.info(f"Found {len(combined_results)} relevant memories")
     for result in combined_results:
@@ -141,12 +173,40 @@ def search_memories(query: str, top_k: int = 5, similarity_threshold: float = 0.
 
     return combined_results
 
+def search_memories_batch(queries: List[str], top_k: int = 5, similarity_threshold: float = 0.0, user_id: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Embedding-only search for many queries, scored with a single matrix-matrix product.
+    Results are returned in the same order as the queries.
+    """
+    logger.info(f"Searching memories for a batch of {len(queries)} queries")
+    with partitions.use(user_id) as partition:
+        return _search_partition_batch(partition, queries, top_k, similarity_threshold)
+
+def _search_partition_batch(partition: MemoryPartition, queries: List[str], top_k: int,
+                            similarity_threshold: float) -> List[List[Dict[str, Any]]]:
+    index = partition.ensure_loaded()
+    if not queries or not len(index):
+        return [[] for _ in queries]
+    query_embeddings = []
+    for query in queries:
+        try:
+            query_embeddings.append(embed_query(query))
+        except Exception as e:
+            logger.error(f"Error generating query embedding: {str(e)}")
+            query_embeddings.append(None)
+    embedded = [embedding for embedding in query_embeddings if embedding is not None]
+    batch_hits = iter(index.search_batch(embedded, top_k) if embedded else [])
+    return [
+        _embedding_results(partition, next(batch_hits), top_k, similarity_threshold) if embedding is not None else []
+        for embedding in query_embeddings
+    ]
+
 def generate_embeddings_for_existing_files():
-    memory_files = get_json_files_in_directory(DATA_DIR)
-    for file in memory_files:
-        if not load_embeddings(file.name):
-            get_embeddings(file.name)
-    logger.info(f"Generated embeddings for {len(memory_files)} files")
+    """
+    Synchronous backfill; the server uses embedding_backfill.start() instead.
+    """
+    embedding_backfill.run()
+    load_memory_index()
 
 def generate_search_query(topic: str, perspective: str) -> str:
     prompt = f"""Generate a short, focused search query to find information supporting the {perspective} side of the debate topic: '{topic}'.
@@ -155,7 +215,7 @@ def generate_search_query(topic: str, perspective: str) -> str:
         "query": "Your search query here"
     }}
     """
-    response = process_prompt(prompt, DEFAULT_MODEL, "Search Query Generator")
+    response = process_prompt(prompt, DEFAULT_MODEL, "Search Query Generator", cache=True)
     try:
         query_json = json.loads(response)
         return query_json['query']
@@ -164,7 +224,4 @@ def generate_search_query(topic: str, perspective: str) -> str:
         return f"Error: Could not generate a valid search query for {topic} ({perspective})"
     except KeyError:
         logger.error(f"Missing 'query' key in JSON response: {response}")
-        return f"Error: Invalid response format for {topic} ({perspective})"
-
-# Run this function when the module is imported to ensure all files have embeddings
-generate_embeddings_for_existing_files()
\ No newline at end of file
+        return f"Error: Invalid response format for {topic} ({perspective})"
\ No newline at end of file
@@ -0,0 +1,305 @@
+# src/modules/memory_store.py
+
+import os
+import json
+import threading
+import itertools
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple, BinaryIO
+from config import DATA_DIR, MEMORY_STORE_DIR, MEMORY_SEGMENT_MAX_BYTES
+from .file_utils import read_json_file, ensure_directory_exists, get_json_files_in_directory
+from .logging_setup import logger
+from .errors import FileOperationError
+
+PUT = "P"
+DELETE = "D"
+
+class MemoryStore:
+    """
+    Log-structured store for memory entries.
+
+    Every write appends one JSON line to the active ``segment_NNNNN.jsonl`` file
+    and one ``op<TAB>offset<TAB>length<TAB>id`` line to its ``.idx`` sidecar, so
+    a memory is saved with a single append and read back with one seek. Later
+    writes of the same id win; deletes append a tombstone. ``compact()``
+    rewrites only the live records into fresh segments.
+    """
+
+    def __init__(self, directory: Path, segment_max_bytes: int = 64 * 1024 * 1024, legacy_dir: Optional[Path] = None):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.legacy_dir = Path(legacy_dir) if legacy_dir else None
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+        self._readers: Dict[int, BinaryIO] = {}
+        self._writer: Optional[BinaryIO] = None
+        self._index_writer: Optional[BinaryIO] = None
+        self._active = 1
+        self._dead_bytes = 0
+        self._opened = False
+        self._sequence = itertools.count()
+
+    # -- layout ---------------------------------------------------------
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"segment_{segment:05d}.jsonl"
+
+    def _index_path(self, segment: int) -> Path:
+        return self.directory / f"segment_{segment:05d}.idx"
+
+    def _legacy_marker(self) -> Path:
+        return self.directory / "legacy_imported"
+
+    def _segments(self) -> List[int]:
+        return sorted(int(p.stem.split("_")[1]) for p in self.directory.glob("segment_*.jsonl"))
+
+    # -- opening and recovery -------------------------------------------
+
+    def _open(self):
+        if self._opened:
+            return
+        with self._lock:
+            if self._opened:
+                return
+            ensure_directory_exists(self.directory)
+            segments = self._segments()
+            for segment in segments:
+                self._load_segment(segment)
+            self._active = segments[-1] if segments else 1
+            self._opened = True
+            logger.info(f"Opened memory store with {len(self._index)} memories in {len(segments)} segments")
+            # The legacy directory is imported once; later runs use database/migrate_memories.py
+            if self.legacy_dir and not self._legacy_marker().exists():
+                self.import_legacy(self.legacy_dir)
+
+    def _apply(self, op: str, memory_id: str, location: Tuple[int, int, int]):
+        previous = self._index.pop(memory_id, None)
+        if previous is not None:
+            self._dead_bytes += previous[2]
+        if op == PUT:
+            self._index[memory_id] = location
+        else:
+            self._dead_bytes += location[2]
+
+    def _load_segment(self, segment: int):
+        indexed_end = 0
+        index_path = self._index_path(segment)
+        if index_path.exists():
+            with index_path.open('r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    op, offset, length, memory_id = line[:-1].split('\t', 3)
+                    offset, length = int(offset), int(length)
+                    self._apply(op, memory_id, (segment, offset, length))
+                    indexed_end = max(indexed_end, offset + length)
+        self._recover_tail(segment, indexed_end)
+
+    def _recover_tail(self, segment: int, indexed_end: int):
+        """
+        Re-index records that reached the segment but not its .idx file (e.g. after a crash).
+        """
+        path = self._segment_path(segment)
+        if path.stat().st_size <= indexed_end:
+            return
+        recovered = []
+        with path.open('rb') as f:
+            f.seek(indexed_end)
+            offset = indexed_end
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt record at {path}:{offset}")
+                    offset += len(line)
+                    continue
+                op = DELETE if record.get("deleted") else PUT
+                recovered.append(f"{op}\t{offset}\t{len(line)}\t{record['id']}\n")
+                self._apply(op, record["id"], (segment, offset, len(line)))
+                offset += len(line)
+        if recovered:
+            with self._index_path(segment).open('a', encoding='utf-8') as f:
+                f.write(''.join(recovered))
+            logger.warning(f"Recovered {len(recovered)} unindexed records in {path.name}")
+
+    # -- writes ---------------------------------------------------------
+
+    def new_id(self, memory_type: str) -> str:
+        """
+        A unique id with microsecond resolution, so writes in the same second never collide.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        return f"{timestamp}_{next(self._sequence):04d}_{memory_type}"
+
+    def _append_record(self, op: str, memory_id: str, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            self._open()
+            if self._writer is None or self._writer.tell() + len(line) > self.segment_max_bytes:
+                self._roll_segment()
+            offset = self._writer.tell()
+            self._writer.write(line)
+            self._writer.flush()
+            self._index_writer.write(f"{op}\t{offset}\t{len(line)}\t{memory_id}\n".encode('utf-8'))
+            self._index_writer.flush()
+            self._apply(op, memory_id, (self._active, offset, len(line)))
+
+    def _roll_segment(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._index_writer.close()
+            self._active += 1
+        path = self._segment_path(self._active)
+        if path.exists() and path.stat().st_size >= self.segment_max_bytes:
+            self._active += 1
+            path = self._segment_path(self._active)
+        self._writer = path.open('ab')
+        self._writer.seek(0, os.SEEK_END)
+        if self._writer.tell() and not path.read_bytes()[-1:] == b'\n':
+            self._writer.write(b'\n')  # terminate a record torn by a crash
+        self._index_writer = self._index_path(self._active).open('ab')
+
+    def append(self, memory_id: str, data: Dict[str, Any]):
+        if '\t' in memory_id or '\n' in memory_id:
+            raise FileOperationError(f"Invalid memory id: {memory_id!r}")
+        self._append_record(PUT, memory_id, {"id": memory_id, "data": data})
+
+    def delete(self, memory_id: str):
+        self._open()
+        if memory_id in self._index:
+            self._append_record(DELETE, memory_id, {"id": memory_id, "deleted": True})
+
+    # -- reads ----------------------------------------------------------
+
+    def __contains__(self, memory_id: str) -> bool:
+        self._open()
+        return memory_id in self._index
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._index)
+
+    def ids(self) -> List[str]:
+        self._open()
+        with self._lock:
+            return list(self._index)
+
+    def _reader(self, segment: int) -> BinaryIO:
+        if segment not in self._readers:
+            self._readers[segment] = self._segment_path(segment).open('rb')
+        return self._readers[segment]
+
+    def get(self, memory_id: str) -> Optional[Dict[str, Any]]:
+        self._open()
+        with self._lock:
+            location = self._index.get(memory_id)
+            if location is None:
+                return None
+            segment, offset, length = location
+            reader = self._reader(segment)
+            reader.seek(offset)
+            line = reader.read(length)
+        return json.loads(line)["data"]
+
+    def scan(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Sequentially yield (memory_id, data) for every live memory, oldest segment first.
+        """
+        self._open()
+        with self._lock:
+            live = {location: memory_id for memory_id, location in self._index.items()}
+            segments = sorted({segment for segment, _, _ in live})
+        for segment in segments:
+            offset = 0
+            with self._segment_path(segment).open('rb') as f:
+                for line in f:
+                    memory_id = live.get((segment, offset, len(line)))
+                    offset += len(line)
+                    if memory_id is not None:
+                        yield memory_id, json.loads(line)["data"]
+
+    # -- maintenance ----------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        self._open()
+        with self._lock:
+            live_bytes = sum(length for _, _, length in self._index.values())
+            return {
+                "memories": len(self._index),
+                "segments": len(self._segments()),
+                "live_bytes": live_bytes,
+                "dead_bytes": self._dead_bytes,
+            }
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Rewrite live records into new segments and remove the old ones.
+        New segments are numbered after the old ones, so a crash part-way
+        through leaves duplicates that resolve to the same latest version.
+        """
+        with self._lock:
+            self._open()
+            old_segments = self._segments()
+            records = list(self.scan())
+            self._close_handles()
+            self._active = (old_segments[-1] if old_segments else 0) + 1
+            self._index = {}
+            self._dead_bytes = 0
+            for memory_id, data in records:
+                self.append(memory_id, data)
+            if self._writer is not None:
+                os.fsync(self._writer.fileno())
+                os.fsync(self._index_writer.fileno())
+            for segment in old_segments:
+                self._segment_path(segment).unlink(missing_ok=True)
+                self._index_path(segment).unlink(missing_ok=True)
+            stats = self.stats()
+        logger.info(f"Compacted memory store: {len(old_segments)} segments -> {stats['segments']}")
+        return stats
+
+    def import_legacy(self, legacy_dir: Path, delete_files: bool = False) -> int:
+        """
+        Import one-JSON-file-per-memory directories (the old DATA_DIR layout).
+        The file name is kept as the memory id so existing embeddings still match.
+        A marker in the store directory stops later opens from scanning it again.
+        """
+        imported = 0
+        for file_path in sorted(get_json_files_in_directory(legacy_dir)):
+            if file_path.name not in self:
+                try:
+                    self.append(file_path.name, read_json_file(file_path))
+                    imported += 1
+                except FileOperationError as e:
+                    logger.error(f"Skipping legacy memory {file_path}: {str(e)}")
+                    continue
+            if delete_files:
+                file_path.unlink()
+        if imported:
+            logger.info(f"Imported {imported} legacy memory files from {legacy_dir}")
+        self._legacy_marker().write_text(datetime.now().isoformat(), encoding='utf-8')
+        return imported
+
+    def _close_handles(self):
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+        if self._writer is not None:
+            self._writer.close()
+            self._index_writer.close()
+        self._writer = None
+        self._index_writer = None
+
+    def close(self):
+        """
+        Close the segment files; the next access reopens the store and rebuilds its index.
+        """
+        with self._lock:
+            self._close_handles()
+            self._index = {}
+            self._dead_bytes = 0
+            self._opened = False
+
+memory_store = MemoryStore(MEMORY_STORE_DIR, MEMORY_SEGMENT_MAX_BYTES, legacy_dir=DATA_DIR)
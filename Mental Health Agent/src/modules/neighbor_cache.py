@@ -0,0 +1,54 @@
+# src/modules/neighbor_cache.py
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .caching import LRUCache
+
+Row = Tuple[str, str, float]
+
+class NeighborCache:
+    """
+    LRU cache of a node's stored neighbourhood, keyed by (node_id, relationship_type).
+
+    Edge writes invalidate the entries of both endpoints, for the edge's
+    relationship and for the unfiltered lookup. A lookup that raced with a
+    write is returned but not cached, so a stale read is never stored.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: Optional[float] = None):
+        self.cache = LRUCache(max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self._version = 0
+        self.invalidations = 0
+
+    def get(self, node_id: str, relationship_type: Optional[str], load: Callable[[str, Optional[str]], List[Row]]) -> List[Row]:
+        key = (node_id, relationship_type or None)
+        rows = self.cache.get(key)
+        if rows is not None:
+            return list(rows)
+        with self._lock:
+            version = self._version
+        rows = load(node_id, relationship_type)
+        with self._lock:
+            if version == self._version:
+                self.cache.set(key, tuple(rows))
+        return rows
+
+    def invalidate(self, edges: Iterable[Tuple[str, str, str, Any]]):
+        keys = set()
+        for source_id, target_id, relationship_type, _ in edges:
+            keys.update(((source_id, None), (source_id, relationship_type),
+                         (target_id, None), (target_id, relationship_type)))
+        with self._lock:
+            self._version += 1
+            for key in keys:
+                if self.cache.pop(key) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "invalidations": self.invalidations}
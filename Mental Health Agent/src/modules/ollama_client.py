@@ -2,85 +2,539 @@
 
 import requests
 import json
+import time
+import heapq
 import asyncio
+import itertools
+import aiohttp
+import threading
 import nest_asyncio
-from typing import Callable, Dict, Any
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Any, Iterator, List, Optional
+from requests.adapters import HTTPAdapter
+from config import (OLLAMA_HOSTS, OLLAMA_TIMEOUT, OLLAMA_POOL_SIZE, OLLAMA_HEADLESS, OLLAMA_KEEP_ALIVE,
+                    OLLAMA_MAX_IN_FLIGHT, OLLAMA_MAX_QUEUE_DEPTH, OLLAMA_QUEUE_TIMEOUT,
+                    OLLAMA_RETRIES, OLLAMA_HEALTH_INTERVAL)
 from rich.live import Live
 from rich.text import Text
 from rich.console import Console
-from .save_history import save_interaction
+from .save_history import queue_interaction
+from .response_cache import response_cache
+from .session_store import ConversationSession, conversation_sessions
+from .ollama_router import OllamaRouter, parse_hosts
 from .logging_setup import logger
+from .errors import OverloadedError
+from .stage_timing import timed
 
 console = Console()
 
 # Apply nest_asyncio to allow nested event loops
 nest_asyncio.apply()
 
+class GenerationTimer:
+    """
+    Times one streamed generation: time to first token and decode throughput.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.tokens = 0
+
+    def token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+    def finish(self, final_chunk: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        finished = time.perf_counter()
+        final_chunk = final_chunk or {}
+        first_token_at = self.first_token_at or finished
+        # Prefer Ollama's own token accounting; fall back to counting streamed chunks
+        tokens = final_chunk.get("eval_count", self.tokens)
+        if final_chunk.get("eval_duration"):
+            tokens_per_second = tokens / (final_chunk["eval_duration"] / 1e9)
+        else:
+            decode_seconds = finished - first_token_at
+            tokens_per_second = tokens / decode_seconds if decode_seconds > 0 else 0.0
+        return {
+            "model": self.model,
+            "ttft_seconds": first_token_at - self.started,
+            "total_seconds": finished - self.started,
+            "tokens": tokens,
+            "tokens_per_second": tokens_per_second,
+        }
+
+class GenerationMetrics:
+    """
+    Rolling window of per-call generation metrics, shared by all clients.
+    """
+
+    def __init__(self, window: int = 256):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, sample: Dict[str, Any]):
+        with self._lock:
+            self._samples.append(sample)
+        logger.info(f"Generation metrics for {sample['model']}: ttft={sample['ttft_seconds']:.3f}s, "
+                    f"{sample['tokens']} tokens at {sample['tokens_per_second']:.1f} tokens/s")
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self) -> Dict[str, Any]:
+        samples = self.recent()
+        if not samples:
+            return {"calls": 0}
+        ttfts = sorted(sample["ttft_seconds"] for sample in samples)
+        return {
+            "calls": len(samples),
+            "ttft_p50_seconds": ttfts[len(ttfts) // 2],
+            "ttft_p95_seconds": ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))],
+            "tokens_per_second": sum(sample["tokens_per_second"] for sample in samples) / len(samples),
+        }
+
+generation_metrics = GenerationMetrics()
+
+# Priority classes, most urgent first
+INTERACTIVE = 0
+HELPER = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", HELPER: "helper", BACKGROUND: "background"}
+
+class RequestScheduler:
+    """
+    Bounded-concurrency gate in front of Ollama.
+
+    At most ``max_in_flight`` requests run at once; the rest wait and are
+    admitted by priority class, oldest first within a class. When the queue is
+    deep, new work is rejected with OverloadedError, lower classes first:
+    background work at a quarter of ``max_queue_depth``, helpers at half, and
+    interactive replies only at the full depth. Callers degrade on rejection.
+    """
+
+    def __init__(self, max_in_flight: int = 2, max_queue_depth: int = 16, queue_timeout: float = 60.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self.in_flight = 0
+        self.max_queue_seen = 0
+        self.admitted = Counter()
+        self.rejected = Counter()
+        self._wait_seconds = {priority: deque(maxlen=256) for priority in PRIORITY_NAMES}
+
+    def queue_limit(self, priority: int) -> int:
+        return max(1, self.max_queue_depth >> priority)
+
+    def acquire(self, priority: int = HELPER, timeout: Optional[float] = None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        started = time.monotonic()
+        with self._condition:
+            if self.in_flight >= self.max_in_flight and len(self._waiting) >= self.queue_limit(priority):
+                self.rejected[priority] += 1
+                raise OverloadedError(f"Ollama queue is full ({len(self._waiting)} waiting), "
+                                      f"rejected {PRIORITY_NAMES[priority]} request")
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, entry)
+            self.max_queue_seen = max(self.max_queue_seen, len(self._waiting))
+            try:
+                while self.in_flight >= self.max_in_flight or self._waiting[0] != entry:
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self.rejected[priority] += 1
+                        raise OverloadedError(f"Waited {timeout:g}s for an Ollama slot, "
+                                              f"rejected {PRIORITY_NAMES[priority]} request")
+                    self._condition.wait(remaining)
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            self._wait_seconds[priority].append(time.monotonic() - started)
+            # The next waiter may be admitted too if there is still a free slot
+            self._condition.notify_all()
+
+    async def acquire_async(self, priority: int = HELPER, timeout: Optional[float] = None):
+        """
+        acquire() for coroutines. The wait runs on a worker thread; if the waiting
+        task is cancelled, the slot that thread still obtains is released again.
+        """
+        waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire, priority, timeout))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            waiter.add_done_callback(self._release_abandoned)
+            raise
+
+    def _release_abandoned(self, waiter: asyncio.Future):
+        if not waiter.cancelled() and waiter.exception() is None:
+            self.release()
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = HELPER, timeout: Optional[float] = None):
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            depth = Counter(priority for priority, _ in self._waiting)
+            stats = {
+                "in_flight": self.in_flight,
+                "queue_depth": len(self._waiting),
+                "max_queue_seen": self.max_queue_seen,
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                waits = sorted(self._wait_seconds[priority])
+                stats[name] = {
+                    "queued": depth[priority],
+                    "admitted": self.admitted[priority],
+                    "rejected": self.rejected[priority],
+                    "wait_p95_seconds": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                }
+            return stats
+
+scheduler = RequestScheduler(OLLAMA_MAX_IN_FLIGHT, OLLAMA_MAX_QUEUE_DEPTH, OLLAMA_QUEUE_TIMEOUT)
+
 class OllamaClient:
-    def __init__(self, base_url="http://localhost:11434", timeout=120):
-        self.base_url = base_url
+    """
+    Synchronous client that keeps a pool of keep-alive connections to Ollama,
+    so consecutive generations reuse TCP connections instead of reconnecting.
+
+    Requests are spread over the router's endpoints; a generation that fails
+    to connect, times out or gets a server error before its first token is
+    retried on another endpoint, up to ``retries`` times.
+
+    In headless mode nothing is rendered to the console, which is what the
+    server wants; the interactive CLI keeps the live rich display.
+    """
+
+    def __init__(self, base_url=None, timeout=OLLAMA_TIMEOUT, pool_size=OLLAMA_POOL_SIZE, headless=OLLAMA_HEADLESS,
+                 hosts=None, retries=OLLAMA_RETRIES, router: Optional[OllamaRouter] = None):
+        self.router = router or OllamaRouter(hosts or ([base_url] if base_url else parse_hosts(OLLAMA_HOSTS)),
+                                             health_interval=OLLAMA_HEALTH_INTERVAL)
+        self.base_url = self.router.primary.url
+        self.retries = min(retries, len(self.router.endpoints) - 1)
         self.timeout = timeout
+        self.pool_size = pool_size
+        self.headless = headless
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
 
-    def process_prompt(self, prompt: str, model: str, username: str, context: str = "") -> str:
-        logger.info(f"Processing prompt for user: {username}, model: {model}")
-        url = f"{self.base_url}/api/generate"
-        headers = {"Content-Type": "application/json"}
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=len(self.router.endpoints), pool_maxsize=self.pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
 
-        data = {"model": model, "prompt": prompt, "stream": False}
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def stream_prompt(self, prompt: str, model: str, username: str, user_id: Optional[str] = None,
+                      on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      options: Optional[Dict[str, Any]] = None,
+                      session: Optional[ConversationSession] = None,
+                      priority: int = HELPER) -> Iterator[str]:
+        """
+        Yield response tokens as Ollama produces them. Once the stream is done the
+        interaction is queued for saving and its metrics are recorded (and passed to on_metrics).
+        With a session, its context tokens are sent along and replaced by the
+        ones Ollama returns. Connection errors propagate to the caller.
+        """
+        logger.info(f"Streaming prompt for user: {username}, model: {model}")
+        data = {"model": model, "prompt": prompt, "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE}
+        if options:
+            data["options"] = options
+        if session is not None and session.context:
+            data["context"] = session.context
+        timer = GenerationTimer(model)
+        chunks = []
+        final_chunk = None
+        tried = []
+        with scheduler.slot(priority):
+            while final_chunk is None:
+                try:
+                    with self.router.use(model, tried) as endpoint:
+                        tried.append(endpoint)
+                        url = f"{endpoint.url}/api/generate"
+                        with self.session.post(url, json=data, stream=True, timeout=self.timeout) as response:
+                            response.raise_for_status()
+                            for line in response.iter_lines():
+                                if not line:
+                                    continue
+                                try:
+                                    json_response = json.loads(line)
+                                except json.JSONDecodeError:
+                                    logger.warning(f"Failed to decode JSON from line: {line}")
+                                    continue
+                                if chunk := json_response.get("response"):
+                                    timer.token()
+                                    chunks.append(chunk)
+                                    yield chunk
+                                if json_response.get("done", False):
+                                    final_chunk = json_response
+                                    break
+                            else:
+                                final_chunk = {}
+                except Exception as e:
+                    # Once tokens have been handed out the generation cannot be replayed elsewhere
+                    if chunks or len(tried) > self.retries or not OllamaRouter.is_endpoint_failure(e):
+                        raise
+                    logger.warning(f"Retrying generation on another Ollama endpoint after {endpoint.url} failed: {str(e)}")
+        if session is not None and final_chunk:
+            session.update(final_chunk.get("context"))
+        sample = timer.finish(final_chunk)
+        generation_metrics.record(sample)
+        if on_metrics:
+            on_metrics(sample)
+        with timed("persist"):
+            queue_interaction(prompt, "".join(chunks).strip(), username, model, user_id)
+
+    def process_prompt(self, prompt: str, model: str, username: str, context: str = "", user_id: Optional[str] = None,
+                       cache: bool = False, options: Optional[Dict[str, Any]] = None,
+                       session: Optional[ConversationSession] = None,
+                       priority: int = HELPER) -> str:
+        """
+        Generate a full response. With cache=True a response for the same
+        (model, prompt, options) is served from the response cache; leave it off
+        for anything user-facing that should not repeat itself. The request
+        waits for a scheduler slot in its priority class (helper by default).
+        """
+        logger.info(f"Processing prompt for user: {username}, model: {model}")
+        if cache and (cached := response_cache.get(model, prompt, options)) is not None:
+            logger.info(f"Serving cached response for {username}")
+            return cached
 
         try:
-            with Live(Text("Processing...", style="yellow bold"), refresh_per_second=4) as live:
-                full_response = self._stream_response(url, headers, data, live)
+            if self.headless:
+                full_response = "".join(self.stream_prompt(prompt, model, username, user_id, options=options, session=session, priority=priority))
+            else:
+                full_response = ""
+                with Live(Text("Processing...", style="yellow bold"), refresh_per_second=4) as live:
+                    for chunk in self.stream_prompt(prompt, model, username, user_id, options=options, session=session, priority=priority):
+                        full_response += chunk
+                        live.update(Text(full_response, style="yellow bold"))
 
             logger.info(f"Response generated for prompt: {prompt[:50]}...")
-            save_interaction(prompt, full_response.strip(), username, model)
+            if cache:
+                response_cache.set(model, prompt, full_response.strip(), options)
             return full_response.strip()
 
+        except OverloadedError as e:
+            error_msg = f"Error: Ollama is busy: {str(e)}"
         except requests.Timeout:
             error_msg = f"Error: Request timed out after {self.timeout} seconds"
-            logger.error(error_msg)
-            console.print(error_msg, style="bold red")
-            return error_msg
         except requests.RequestException as e:
             error_msg = f"Error connecting to Ollama: {str(e)}"
-            logger.error(error_msg)
-            console.print(error_msg, style="bold red")
-            return error_msg
-        except json.JSONDecodeError as e:
-            error_msg = f"Error decoding JSON response: {str(e)}"
-            logger.error(error_msg)
-            console.print(error_msg, style="bold red")
-            return error_msg
         except Exception as e:
             error_msg = f"Unexpected error: {str(e)}"
-            logger.error(error_msg)
+        logger.error(error_msg)
+        if not self.headless:
             console.print(error_msg, style="bold red")
-            return error_msg
-
-    def _stream_response(self, url: str, headers: Dict[str, str], data: Dict[str, Any], live: Live) -> str:
-        full_response = ""
-        with requests.post(url, headers=headers, json=data, stream=True, timeout=self.timeout) as response:
-            response.raise_for_status()
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        json_response = json.loads(line)
-                        if "response" in json_response:
-                            chunk = json_response["response"]
-                            full_response += chunk
-                            live.update(Text(full_response, style="yellow bold"))
-                        if json_response.get("done", False):
-                            break
-                    except json.JSONDecodeError:
-                        logger.warning(f"Failed to decode JSON from line: {line}")
-                        continue
-        return full_response
-
-default_client = OllamaClient()
-
-def process_prompt(prompt: str, model: str, username: str, context: str = "") -> str:
-    return default_client.process_prompt(prompt, model, username, context)
+        return error_msg
+
+    def converse(self, turn_prompt: str, system_prompt: str, model: str, username: str, user_id: Optional[str] = None,
+                 history: str = "") -> str:
+        """
+        One turn of a user's conversation. The system prompt and recent history
+        are only prefilled when the session starts; later turns send just the new
+        turn along with the session's context tokens. Turns of one user run one at a time.
+        """
+        session = conversation_sessions.get(user_id, model)
+        with session.lock:
+            prompt = conversation_sessions.prompt_for(session, system_prompt, turn_prompt, history)
+            return self.process_prompt(prompt, model, username, user_id=user_id, session=session, priority=INTERACTIVE)
+
+class AsyncOllamaClient:
+    """
+    aiohttp counterpart of OllamaClient for code running on an event loop.
+
+    The connection pool belongs to the event loop that first uses the client;
+    nothing is rendered to the console, so it is safe to share across requests.
+    """
+
+    def __init__(self, base_url=None, timeout=OLLAMA_TIMEOUT, pool_size=OLLAMA_POOL_SIZE,
+                 hosts=None, retries=OLLAMA_RETRIES, router: Optional[OllamaRouter] = None):
+        self.router = router or OllamaRouter(hosts or ([base_url] if base_url else parse_hosts(OLLAMA_HOSTS)),
+                                             health_interval=OLLAMA_HEALTH_INTERVAL)
+        self.base_url = self.router.primary.url
+        self.retries = min(retries, len(self.router.endpoints) - 1)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def stream_prompt(self, prompt: str, model: str, username: str, user_id: Optional[str] = None,
+                            on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None,
+                            options: Optional[Dict[str, Any]] = None,
+                            session: Optional[ConversationSession] = None,
+                            priority: int = HELPER) -> AsyncIterator[str]:
+        """
+        Async generator version of OllamaClient.stream_prompt.
+        """
+        logger.info(f"Streaming prompt asynchronously for user: {username}, model: {model}")
+        data = {"model": model, "prompt": prompt, "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE}
+        if options:
+            data["options"] = options
+        if session is not None and session.context:
+            data["context"] = session.context
+        timer = GenerationTimer(model)
+        chunks = []
+        final_chunk = None
+        tried = []
+        http = await self.session()
+        await scheduler.acquire_async(priority)
+        try:
+            while final_chunk is None:
+                try:
+                    with self.router.use(model, tried) as endpoint:
+                        tried.append(endpoint)
+                        async with http.post(f"{endpoint.url}/api/generate", json=data) as response:
+                            response.raise_for_status()
+                            async for line in response.content:
+                                if not line.strip():
+                                    continue
+                                try:
+                                    json_response = json.loads(line)
+                                except json.JSONDecodeError:
+                                    logger.warning(f"Failed to decode JSON from line: {line}")
+                                    continue
+                                if chunk := json_response.get("response"):
+                                    timer.token()
+                                    chunks.append(chunk)
+                                    yield chunk
+                                if json_response.get("done", False):
+                                    final_chunk = json_response
+                                    break
+                            else:
+                                final_chunk = {}
+                except Exception as e:
+                    if chunks or len(tried) > self.retries or not OllamaRouter.is_endpoint_failure(e):
+                        raise
+                    logger.warning(f"Retrying generation on another Ollama endpoint after {endpoint.url} failed: {str(e)}")
+        finally:
+            scheduler.release()
+        if session is not None and final_chunk:
+            session.update(final_chunk.get("context"))
+        sample = timer.finish(final_chunk)
+        generation_metrics.record(sample)
+        if on_metrics:
+            on_metrics(sample)
+        # Queueing can wait for buffer space, or write synchronously (memory store,
+        # embeddings, MySQL) when the queue is disabled, so keep it off the event loop
+        await asyncio.to_thread(queue_interaction, prompt, "".join(chunks).strip(), username, model, user_id)
+
+    async def process_prompt(self, prompt: str, model: str, username: str, context: str = "", user_id: Optional[str] = None,
+                             cache: bool = False, options: Optional[Dict[str, Any]] = None,
+                             session: Optional[ConversationSession] = None,
+                             priority: int = HELPER) -> str:
+        logger.info(f"Processing prompt asynchronously for user: {username}, model: {model}")
+        if cache and (cached := response_cache.get(model, prompt, options)) is not None:
+            logger.info(f"Serving cached response for {username}")
+            return cached
+
+        try:
+            full_response = "".join([chunk async for chunk in self.stream_prompt(prompt, model, username, user_id, options=options, session=session, priority=priority)])
+            logger.info(f"Response generated for prompt: {prompt[:50]}...")
+            if cache:
+                response_cache.set(model, prompt, full_response.strip(), options)
+            return full_response.strip()
+
+        except OverloadedError as e:
+            error_msg = f"Error: Ollama is busy: {str(e)}"
+        except asyncio.TimeoutError:
+            error_msg = f"Error: Request timed out after {self.timeout} seconds"
+        except aiohttp.ClientError as e:
+            error_msg = f"Error connecting to Ollama: {str(e)}"
+        except Exception as e:
+            error_msg = f"Unexpected error: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+
+    generate_response = process_prompt
+
+    async def converse(self, turn_prompt: str, system_prompt: str, model: str, username: str, user_id: Optional[str] = None,
+                       history: str = "") -> str:
+        """
+        Async version of OllamaClient.converse; turns of one user still run one at a time.
+        """
+        session = conversation_sessions.get(user_id, model)
+        await session.acquire_async()
+        try:
+            prompt = conversation_sessions.prompt_for(session, system_prompt, turn_prompt, history)
+            return await self.process_prompt(prompt, model, username, user_id=user_id, session=session, priority=INTERACTIVE)
+        finally:
+            session.lock.release()
+
+# Both default clients share one router so load and health are tracked per endpoint, not per client
+default_router = OllamaRouter(parse_hosts(OLLAMA_HOSTS), health_interval=OLLAMA_HEALTH_INTERVAL)
+default_client = OllamaClient(router=default_router)
+default_async_client = AsyncOllamaClient(router=default_router)
+
+def process_prompt(prompt: str, model: str, username: str, context: str = "", user_id: Optional[str] = None,
+                   cache: bool = False, options: Optional[Dict[str, Any]] = None, priority: int = HELPER) -> str:
+    return default_client.process_prompt(prompt, model, username, context, user_id, cache, options, priority=priority)
 
 generate_response = process_prompt
 
-__all__ = ['OllamaClient', 'process_prompt', 'generate_response']
\ No newline at end of file
+def converse(turn_prompt: str, system_prompt: str, model: str, username: str, user_id: Optional[str] = None,
+             history: str = "") -> str:
+    return default_client.converse(turn_prompt, system_prompt, model, username, user_id, history)
+
+def stream_prompt(prompt: str, model: str, username: str, user_id: Optional[str] = None,
+                  on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None,
+                  options: Optional[Dict[str, Any]] = None, priority: int = HELPER) -> Iterator[str]:
+    return default_client.stream_prompt(prompt, model, username, user_id, on_metrics, options, priority=priority)
+
+async def async_process_prompt(prompt: str, model: str, username: str, context: str = "", user_id: Optional[str] = None,
+                               cache: bool = False, options: Optional[Dict[str, Any]] = None, priority: int = HELPER) -> str:
+    return await default_async_client.process_prompt(prompt, model, username, context, user_id, cache, options, priority=priority)
+
+async_generate_response = async_process_prompt
+
+def async_stream_prompt(prompt: str, model: str, username: str, user_id: Optional[str] = None,
+                        on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        options: Optional[Dict[str, Any]] = None, priority: int = HELPER) -> AsyncIterator[str]:
+    return default_async_client.stream_prompt(prompt, model, username, user_id, on_metrics, options, priority=priority)
+
+__all__ = ['OllamaClient', 'AsyncOllamaClient', 'process_prompt', 'generate_response', 'stream_prompt', 'converse',
+           'async_process_prompt', 'async_generate_response', 'async_stream_prompt', 'generation_metrics',
+           'scheduler', 'INTERACTIVE', 'HELPER', 'BACKGROUND']
@@ -0,0 +1,180 @@
+# src/modules/ollama_router.py
+
+import time
+import asyncio
+import aiohttp
+import threading
+import requests
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set
+from .logging_setup import logger
+
+class Endpoint:
+    """
+    One Ollama server: its health, the models it serves and its current load.
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.models: Set[str] = set()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.retry_at = 0.0
+
+    def serves(self, model: str) -> bool:
+        # An endpoint that has not reported its models yet is assumed to serve all of them
+        return not self.models or model in self.models or f"{model}:latest" in self.models
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "models": sorted(self.models),
+        }
+
+class OllamaRouter:
+    """
+    Routes requests across several Ollama endpoints.
+
+    Requests go to the least-loaded healthy endpoint that serves the model,
+    preferring the endpoint that last served the model (affinity) when it is
+    no busier, so its weights stay warm. An endpoint that fails is taken out
+    of rotation until the background health check sees it answer again, or
+    until ``retry_after`` seconds pass and it gets another chance.
+    """
+
+    def __init__(self, urls: Iterable[str], health_interval: float = 15.0, retry_after: float = 30.0,
+                 affinity: bool = True, health_timeout: float = 2.0):
+        self.endpoints = [Endpoint(url) for url in urls]
+        if not self.endpoints:
+            raise ValueError("OllamaRouter needs at least one endpoint")
+        self.health_interval = health_interval
+        self.retry_after = retry_after
+        self.affinity = affinity
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._affinity: Dict[str, Endpoint] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def primary(self) -> Endpoint:
+        return self.endpoints[0]
+
+    def choose(self, model: str, exclude: Iterable[Endpoint] = ()) -> Endpoint:
+        exclude = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            available = [e for e in self.endpoints if e not in exclude and (e.healthy or e.retry_at <= now)]
+            if not available:
+                # Everything is down or excluded: try the endpoint that failed longest ago
+                remaining = [e for e in self.endpoints if e not in exclude] or self.endpoints
+                available = [min(remaining, key=lambda e: e.retry_at)]
+            candidates = [e for e in available if e.serves(model)] or available
+            least = min(e.in_flight for e in candidates)
+            preferred = self._affinity.get(model) if self.affinity else None
+            if preferred in candidates and preferred.in_flight <= least:
+                return preferred
+            return min(candidates, key=lambda e: (e.in_flight, e.requests))
+
+    @contextmanager
+    def use(self, model: str, exclude: Iterable[Endpoint] = ()):
+        """
+        Reserve the chosen endpoint for one request; connection failures,
+        timeouts and server errors raised inside the block mark it unhealthy.
+        """
+        endpoint = self.choose(model, exclude)
+        with self._lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        self.start()
+        try:
+            yield endpoint
+        except Exception as e:
+            if self.is_endpoint_failure(e):
+                self.mark_failure(endpoint)
+            raise
+        else:
+            with self._lock:
+                endpoint.healthy = True
+                endpoint.consecutive_failures = 0
+                self._affinity[model] = endpoint
+        finally:
+            with self._lock:
+                endpoint.in_flight -= 1
+
+    @staticmethod
+    def is_endpoint_failure(error: Exception) -> bool:
+        """
+        Whether an error says the endpoint is unusable (so another one may be tried),
+        as opposed to a problem with the request itself.
+        """
+        if isinstance(error, (requests.ConnectionError, requests.Timeout, aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code >= 500
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status >= 500
+        return False
+
+    def mark_failure(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.healthy = False
+            endpoint.retry_at = time.monotonic() + self.retry_after
+        logger.warning(f"Ollama endpoint {endpoint.url} marked unhealthy "
+                       f"({endpoint.consecutive_failures} consecutive failures)")
+
+    def check_health(self):
+        for endpoint in self.endpoints:
+            try:
+                response = requests.get(f"{endpoint.url}/api/tags", timeout=self.health_timeout)
+                response.raise_for_status()
+                models = {model["name"] for model in response.json().get("models", [])}
+            except Exception as e:
+                if endpoint.healthy:
+                    logger.warning(f"Health check failed for Ollama endpoint {endpoint.url}: {str(e)}")
+                with self._lock:
+                    endpoint.healthy = False
+                    endpoint.retry_at = time.monotonic() + self.retry_after
+                continue
+            with self._lock:
+                if not endpoint.healthy:
+                    logger.info(f"Ollama endpoint {endpoint.url} is healthy again")
+                endpoint.healthy = True
+                endpoint.consecutive_failures = 0
+                endpoint.models = models
+
+    def start(self):
+        """
+        Start the periodic health check; a single endpoint does not need one.
+        """
+        if self._thread is not None or len(self.endpoints) < 2:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check_health()
+            if self._stop.wait(self.health_interval):
+                break
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {endpoint.url: endpoint.stats() for endpoint in self.endpoints}
+
+def parse_hosts(hosts: str) -> List[str]:
+    return [host.strip() for host in hosts.split(",") if host.strip()]
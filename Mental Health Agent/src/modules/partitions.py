@@ -0,0 +1,222 @@
+# src/modules/partitions.py
+
+import re
+import time
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config import (USER_PARTITIONS_DIR, EMBEDDING_SEGMENT_SIZE, MEMORY_SEGMENT_MAX_BYTES,
+                    MAX_RESIDENT_PARTITIONS, PARTITION_IDLE_SECONDS)
+from .logging_setup import logger
+from .ann_index import create_ann_index
+from .embedding_store import EmbeddingStore
+from .embeddings import memory_text, embedding_store, load_embeddings
+from .lexical_index import BM25Index
+from .memory_store import MemoryStore, memory_store
+from .vector_index import VectorIndex, memory_index, memory_metadata
+
+SHARED_PARTITION = "_shared"
+
+class MemoryPartition:
+    """
+    One user's memories, their vectors and their search indexes.
+
+    The stores are opened on first use; the vector index and the BM25 index are
+    built on demand. A cold partition is closed and dropped as a whole.
+    """
+
+    def __init__(self, key: str, store: MemoryStore, vectors: EmbeddingStore, index: VectorIndex):
+        self.key = key
+        self.memory_store = store
+        self.embedding_store = vectors
+        self.index = index
+        self.lexical = BM25Index()
+        self.last_used = time.monotonic()
+        # Background work holding the partition; it is not evicted while pinned
+        self.pins = 0
+        self._load_lock = threading.Lock()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def load_vector(self, memory_id: str) -> List[float]:
+        if self.key == SHARED_PARTITION:
+            # The shared partition still understands the legacy JSON embeddings layout
+            return load_embeddings(memory_id)
+        vector = self.embedding_store.get(memory_id)
+        return [] if vector is None else vector.tolist()
+
+    def ensure_loaded(self) -> VectorIndex:
+        """
+        Build the resident indexes from this partition's stores on first use.
+        Every memory is indexed lexically; memories without a stored vector are
+        left out of the vector index until the background backfill embeds them.
+        """
+        self.touch()
+        if self.index.loaded:
+            return self.index
+        with self._load_lock:
+            if self.index.loaded:
+                return self.index
+            stored_ids, stored_vectors = self.embedding_store.load_all()
+            stored_positions = {memory_id: i for i, memory_id in enumerate(stored_ids)}
+            for memory_id, memory_data in self.memory_store.scan():
+                self.lexical.add(memory_id, memory_text(memory_data))
+                if memory_id in self.index:
+                    continue
+                position = stored_positions.get(memory_id)
+                embeddings = stored_vectors[position] if position is not None else self.load_vector(memory_id)
+                if len(embeddings) == 0:
+                    continue
+                self.index.add(memory_id, embeddings, memory_metadata(memory_data))
+            self.index.loaded = True
+            logger.info(f"Loaded {len(self.index)} memories into the index for partition {self.key}")
+        return self.index
+
+    def evict(self):
+        self.index.clear()
+        self.lexical.clear()
+        self.memory_store.close()
+        self.embedding_store.close()
+        logger.info(f"Evicted cold memory partition {self.key}")
+
+class PartitionManager:
+    """
+    Maps user ids to memory partitions, opening them lazily and evicting cold ones.
+    Callers take a partition with ``use()``, which pins it until they are done.
+
+    At most ``max_resident`` user partitions stay open; past that, and for
+    partitions idle longer than ``idle_seconds``, the least recently used are
+    closed and dropped. Memories saved without a user id live in the shared
+    partition, which uses the original store locations and is never evicted.
+    """
+
+    def __init__(self, root: Path, shared: MemoryPartition, max_resident: int = 64, idle_seconds: float = 1800,
+                 sweep_interval: float = 60):
+        self.root = Path(root)
+        self.shared = shared
+        self.max_resident = max_resident
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = min(sweep_interval, idle_seconds)
+        self._lock = threading.Lock()
+        self._partitions: Dict[str, MemoryPartition] = {SHARED_PARTITION: shared}
+        self._last_sweep = time.monotonic()
+        self.evictions = 0
+
+    @staticmethod
+    def key(user_id: Any) -> str:
+        if user_id is None:
+            return SHARED_PARTITION
+        key = str(user_id)
+        if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", key) and key != SHARED_PARTITION:
+            return key
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def _create(self, key: str) -> MemoryPartition:
+        directory = self.root / key
+        return MemoryPartition(
+            key,
+            MemoryStore(directory / "segments", MEMORY_SEGMENT_MAX_BYTES),
+            EmbeddingStore(directory / "embeddings", EMBEDDING_SEGMENT_SIZE),
+            VectorIndex(ann=create_ann_index(directory / "ivf_index.npz")),
+        )
+
+    def _pin(self, key: str, touch: bool) -> Tuple[MemoryPartition, bool]:
+        with self._lock:
+            partition = self._partitions.get(key)
+            opened = partition is None
+            if opened:
+                partition = self._partitions[key] = self._create(key)
+                if not touch:
+                    # Never used, so it goes first when evicting
+                    partition.last_used = 0.0
+            if touch:
+                partition.touch()
+            partition.pins += 1
+            return partition, opened
+
+    def _unpin(self, partition: MemoryPartition):
+        with self._lock:
+            partition.pins -= 1
+
+    @contextmanager
+    def use(self, user_id: Any = None) -> Iterator[MemoryPartition]:
+        """
+        The user's partition, pinned against eviction until the block exits.
+        Hold it for the whole read, append or index operation: an evicted
+        partition's stores are closed.
+        """
+        partition, _ = self._pin(self.key(user_id), touch=True)
+        try:
+            if len(self._partitions) - 1 > self.max_resident or time.monotonic() - self._last_sweep > self.sweep_interval:
+                self.evict_cold()
+            yield partition
+        finally:
+            self._unpin(partition)
+
+    def keys(self) -> List[str]:
+        """
+        Keys of every partition on disk, including ones not opened in this process.
+        """
+        keys = [SHARED_PARTITION]
+        if self.root.exists():
+            keys += sorted(directory.name for directory in self.root.iterdir() if directory.is_dir())
+        return keys
+
+    @contextmanager
+    def borrow(self, key: str) -> Iterator[MemoryPartition]:
+        """
+        use() for background work: the partition is pinned but not marked as
+        used, and one opened only for the borrow is closed again afterwards.
+        """
+        partition, opened = self._pin(key, touch=False)
+        try:
+            yield partition
+        finally:
+            self._unpin(partition)
+            if opened and partition.last_used == 0.0:
+                self._evict([partition])
+
+    def evict_cold(self):
+        now = time.monotonic()
+        self._last_sweep = now
+        with self._lock:
+            candidates = sorted(
+                (p for p in self._partitions.values() if p is not self.shared and not p.pins),
+                key=lambda p: p.last_used,
+            )
+            overflow = len(self._partitions) - 1 - self.max_resident
+        self._evict([
+            partition for i, partition in enumerate(candidates)
+            if i < overflow or now - partition.last_used > self.idle_seconds
+        ], now)
+
+    def _evict(self, cold: List[MemoryPartition], chosen_at: Optional[float] = None):
+        for partition in cold:
+            with self._lock:
+                if partition.pins or self._partitions.get(partition.key) is not partition:
+                    continue
+                if chosen_at is not None and partition.last_used > chosen_at:
+                    # Used again since it was picked
+                    continue
+                del self._partitions[partition.key]
+            partition.evict()
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            partitions = list(self._partitions.values())
+        return {
+            "open": len(partitions),
+            "resident": sum(1 for p in partitions if p.index.loaded),
+            "evictions": self.evictions,
+        }
+
+partitions = PartitionManager(
+    USER_PARTITIONS_DIR,
+    MemoryPartition(SHARED_PARTITION, memory_store, embedding_store, memory_index),
+    MAX_RESIDENT_PARTITIONS,
+    PARTITION_IDLE_SECONDS,
+)
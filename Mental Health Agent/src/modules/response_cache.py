@@ -0,0 +1,150 @@
+# src/modules/response_cache.py
+
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+from config import (RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_FILE,
+                    RESPONSE_CACHE_DISK_SIZE)
+from .caching import LRUCache
+from .logging_setup import logger
+
+class ResponseCache:
+    """
+    Content-addressed cache of LLM responses keyed by (model, prompt hash, generation options).
+
+    Only callers that opt in are cached; their prompts must be deterministic
+    for a hit to be meaningful. Entries expire after ``ttl`` seconds in both
+    the memory LRU tier and the optional SQLite disk tier. The disk tier is
+    pruned every ``prune_every`` writes: expired rows are deleted, then the
+    oldest rows beyond ``max_disk_rows``.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: Optional[float] = 3600, path: Optional[Path] = None, enabled: bool = True,
+                 max_disk_rows: int = 10000, prune_every: int = 100):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.memory = LRUCache(max_size, ttl=ttl)
+        self.path = Path(path) if path else None
+        self.max_disk_rows = max_disk_rows
+        self.prune_every = prune_every
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.path and enabled:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+                    "response TEXT NOT NULL, expires_at REAL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening response cache {self.path}, disk tier disabled: {str(e)}")
+                self._conn = None
+            else:
+                self.prune()
+
+    @staticmethod
+    def key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        return hashlib.sha256(
+            json.dumps([model, prompt_hash, options or {}], sort_keys=True).encode()
+        ).hexdigest()
+
+    def get(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = self.key(model, prompt, options)
+        response = self.memory.get(key)
+        if response is not None or self._conn is None:
+            return response
+        with self._lock:
+            row = self._conn.execute("SELECT response, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        response, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, response, ttl=None if expires_at is None else expires_at - time.time())
+        return response
+
+    def set(self, model: str, prompt: str, response: str, options: Optional[Dict[str, Any]] = None):
+        if not self.enabled:
+            return
+        key = self.key(model, prompt, options)
+        self.memory.set(key, response)
+        if self._conn is None:
+            return
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, model, response, expires_at),
+                )
+                self._conn.commit()
+                self._writes += 1
+        except sqlite3.Error as e:
+            logger.error(f"Error writing response cache entry: {str(e)}")
+            return
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Delete expired rows from the disk tier, then the oldest rows past max_disk_rows.
+        """
+        if self._conn is None:
+            return 0
+        try:
+            with self._lock:
+                expired = self._conn.execute(
+                    "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+                ).rowcount
+                # INSERT OR REPLACE gives a rewritten entry a new rowid, so rowid order is write order
+                evicted = self._conn.execute(
+                    "DELETE FROM responses WHERE rowid IN "
+                    "(SELECT rowid FROM responses ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_rows,),
+                ).rowcount
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error pruning response cache: {str(e)}")
+            return 0
+        self.disk_evictions += evicted
+        if expired or evicted:
+            logger.debug(f"Pruned {expired} expired and {evicted} old response cache rows")
+        return expired + evicted
+
+    def clear(self):
+        self.memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        misses = memory["misses"] - self.disk_hits
+        return {
+            "enabled": self.enabled,
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": misses,
+            "hit_rate": (lookups - misses) / lookups if lookups else 0.0,
+            "memory_size": memory["size"],
+            "evictions": memory["evictions"],
+            "disk_evictions": self.disk_evictions,
+        }
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_FILE or None, RESPONSE_CACHE_ENABLED,
+                               RESPONSE_CACHE_DISK_SIZE)
@@ -1,14 +1,19 @@
 # src/modules/save_history.py
 
-import json
 import hashlib
 from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, List, Tuple
-from config import MEMORY_LENGTH, DATA_DIR, CHAT_HISTORY_FILE
-from .file_utils import read_json_file, write_json_file, ensure_directory_exists
+from contextlib import ExitStack
+from typing import Dict, Any, List, Optional, Tuple
+from config import (MEMORY_LENGTH, CHAT_HISTORY_FILE, WRITE_BEHIND_ENABLED, WRITE_BEHIND_BATCH_SIZE,
+                    WRITE_BEHIND_MAX_BUFFER, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_JOURNAL,
+                    WRITE_BEHIND_PUT_TIMEOUT)
+from .file_utils import read_json_file, write_json_file
 from .logging_setup import logger
-from src.modules.kb_graph import create_edge, get_db_connection
+from .embeddings import memory_text, embed_batch
+from .vector_index import memory_metadata
+from .partitions import MemoryPartition, partitions
+from .write_behind import WriteBehindQueue
+from src.modules.kb_graph import Edge, edge_buffer, traverse
 
 class ChatHistory:
     _instance = None
@@ -33,6 +38,17 @@ class ChatHistory:
         # Add entry to edge-based knowledge graph
         self.add_to_edge_kb(prompt, response)
 
+    def add_entries(self, entries: List[Tuple[str, str]]):
+        """
+        Add several prompt-response pairs with a single write of the history file.
+        """
+        for prompt, response in entries:
+            self.history.append({"prompt": prompt, "response": response})
+        del self.history[:-self.max_length]
+        self.save_history()
+        logger.info(f"Added {len(entries)} entries to chat history. Total entries: {len(self.history)}")
+        edge_buffer.add(self.edge(prompt, response) for prompt, response in entries)
+
     def get_history(self):
         return self.history
 
@@ -62,18 +78,18 @@ class ChatHistory:
         """
         Add the prompt-response pair to the edge-based knowledge graph.
         """
+        edge_buffer.add([self.edge(prompt, response)])
+
+    @staticmethod
+    def edge(prompt: str, response: str) -> Edge:
         prompt_id = hashlib.md5(prompt.encode()).hexdigest()
         response_id = hashlib.md5(response.encode()).hexdigest()
-
-        # Create edges for prompt and response
-        create_edge(prompt_id, response_id, "PROMPT_RESPONSE", 1.0)
+        return (prompt_id, response_id, "PROMPT_RESPONSE", 1.0)
 
 chat_history = ChatHistory()
 
-def save_memory(memory_type: str, content: Dict[str, Any], username: str, model_name: str, metadata: Dict[str, Any] = None):
-    ensure_directory_exists(DATA_DIR)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{timestamp}_{memory_type}.json"
+def _memory_data(memory_type: str, content: Any, username: str, model_name: str, metadata: Dict[str, Any] = None,
+                 user_id: Optional[str] = None) -> Dict[str, Any]:
     data = {
         "timestamp": datetime.now().isoformat(),
         "username": username,
@@ -83,77 +99,191 @@ def save_memory(memory_type: str, content: Dict[str, Any], username: str, model_
         "access_count": 0,
         "permanent_marker": 0
     }
+    if user_id is not None:
+        data["user_id"] = str(user_id)
     if metadata:
         data.update(metadata)
-    file_path = DATA_DIR / filename
-    write_json_file(file_path, data)
-    logger.info(f"Saved {memory_type} memory: {filename}")
+    return data
+
+def save_memory(memory_type: str, content: Dict[str, Any], username: str, model_name: str, metadata: Dict[str, Any] = None, user_id: Optional[str] = None) -> str:
+    data = _memory_data(memory_type, content, username, model_name, metadata, user_id)
+    with partitions.use(user_id) as partition:
+        memory_id = partition.memory_store.new_id(memory_type)
+        partition.memory_store.append(memory_id, data)
+        logger.info(f"Saved {memory_type} memory: {memory_id} (partition {partition.key})")
+
+        # Append to the resident vector index so searches never rescan the memory store
+        index_memories([(memory_id, data)], partition)
 
     # Add to edge-based knowledge graph
-    add_memory_to_edge_kb(data)
+    add_memory_to_edge_kb(memory_id, data)
+    return memory_id
 
-def save_interaction(prompt: str, response: str, username: str, model_name: str):
+def index_memory(filename: str, memory_data: Dict[str, Any], partition: Optional[MemoryPartition] = None):
+    index_memories([(filename, memory_data)], partition)
+
+def index_memories(records: List[Tuple[str, Dict[str, Any]]], partition: Optional[MemoryPartition] = None):
+    """
+    Embed new memories with batched requests and add them to the partition's stores and indexes.
+    """
+    partition = partition or partitions.shared
+    texts = [memory_text(memory_data) for _, memory_data in records]
+    # An index that is not resident picks the memories up from the stores when it is next loaded
+    if partition.index.loaded:
+        for (filename, _), text in zip(records, texts):
+            partition.lexical.add(filename, text)
+    try:
+        vectors = embed_batch(texts)
+    except Exception as e:
+        logger.error(f"Error generating embeddings for {len(records)} memories: {str(e)}")
+        return
+    try:
+        partition.embedding_store.append_many((filename, vector) for (filename, _), vector in zip(records, vectors))
+    except Exception as e:
+        logger.error(f"Error saving embeddings for {len(records)} memories: {str(e)}")
+    if partition.index.loaded:
+        for (filename, memory_data), vector in zip(records, vectors):
+            partition.index.add(filename, vector, memory_metadata(memory_data))
+
+def save_interaction(prompt: str, response: str, username: str, model_name: str, user_id: Optional[str] = None):
     logger.debug(f"Saving interaction: prompt='{prompt[:50]}...', response='{response[:50]}...', username='{username}', model='{model_name}'")
     chat_history.add_entry(prompt, response)
-    save_memory("interaction", {"prompt": prompt, "response": response}, username, model_name)
+    save_memory("interaction", {"prompt": prompt, "response": response}, username, model_name, user_id=user_id)
     logger.debug(f"Saved interaction for user {username}")
 
-def save_document_chunk(chunk_id: str, chunk_content: str, username: str, model_name: str):
-    save_memory("document_chunk", chunk_content, username, model_name, {"chunk_id": chunk_id})
-    logger.debug(f"Saved document chunk {chunk_id} for user {username}")
+def queue_interaction(prompt: str, response: str, username: str, model_name: str, user_id: Optional[str] = None):
+    """
+    Save an interaction from the write-behind queue, off the caller's path.
+    """
+    write_queue.submit({"kind": "interaction", "prompt": prompt, "response": response, "username": username,
+                        "model_name": model_name, "user_id": user_id})
+
+def queue_chat_entry(prompt: str, response: str):
+    write_queue.submit({"kind": "chat_entry", "prompt": prompt, "response": response})
+
+def save_queued_writes(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Write a batch from the write-behind queue: one chat history file write for
+    the batch and one embedding request per partition. Returns the items that
+    could not be saved.
+    """
+    failed = []
+    try:
+        chat_history.add_entries([(item["prompt"], item["response"]) for item in items])
+    except Exception as e:
+        logger.error(f"Error saving {len(items)} chat history entries: {str(e)}")
+        failed.extend(item for item in items if item["kind"] == "chat_entry")
+
+    records: Dict[str, Tuple[MemoryPartition, List[Tuple[str, Dict[str, Any]]]]] = {}
+    edges: List[Edge] = []
+    # Every partition in the batch stays pinned until its memories are indexed
+    with ExitStack() as pinned:
+        for item in items:
+            if item["kind"] != "interaction":
+                continue
+            try:
+                key = partitions.key(item["user_id"])
+                if key not in records:
+                    records[key] = (pinned.enter_context(partitions.use(item["user_id"])), [])
+                partition = records[key][0]
+                memory_id = partition.memory_store.new_id("interaction")
+                data = _memory_data("interaction", {"prompt": item["prompt"], "response": item["response"]},
+                                    item["username"], item["model_name"], user_id=item["user_id"])
+                partition.memory_store.append(memory_id, data)
+            except Exception as e:
+                logger.error(f"Error saving interaction memory for user {item['username']}: {str(e)}")
+                failed.append(item)
+                continue
+            records[key][1].append((memory_id, data))
+
+        for partition, partition_records in records.values():
+            if partition_records:
+                index_memories(partition_records, partition)
+                edges.extend(edge for memory_id, data in partition_records for edge in memory_edges(memory_id, data))
+    edge_buffer.add(edges)
+    logger.debug(f"Saved {len(items) - len(failed)} queued writes")
+    return failed
+
+def save_document_chunk(chunk_id: str, chunk_content: str, username: str, model_name: str, user_id: Optional[str] = None):
+    save_document_chunks([(chunk_id, chunk_content)], username, model_name, user_id)
+
+def save_document_chunks(chunks: List[Tuple[str, str]], username: str, model_name: str, user_id: Optional[str] = None) -> List[str]:
+    """
+    Ingest (chunk_id, content) pairs, embedding them in batches instead of one request per chunk.
+    """
+    records = []
+    with partitions.use(user_id) as partition:
+        for chunk_id, chunk_content in chunks:
+            memory_id = partition.memory_store.new_id("document_chunk")
+            data = _memory_data("document_chunk", chunk_content, username, model_name, {"chunk_id": chunk_id}, user_id)
+            partition.memory_store.append(memory_id, data)
+            records.append((memory_id, data))
+        index_memories(records, partition)
+    edge_buffer.add(edge for memory_id, data in records for edge in memory_edges(memory_id, data))
+    logger.debug(f"Saved {len(records)} document chunks for user {username}")
+    return [memory_id for memory_id, _ in records]
 
 def get_chat_history():
     return chat_history.get_history()
 
-def add_memory_to_edge_kb(memory_data: Dict[str, Any]):
+def add_memory_to_edge_kb(memory_id: str, memory_data: Dict[str, Any]):
     """
     Add a memory entry to the edge-based knowledge graph.
     """
-    memory_id = hashlib.md5(json.dumps(memory_data, sort_keys=True).encode()).hexdigest()
+    edge_buffer.add(memory_edges(memory_id, memory_data))
+
+def memory_edges(memory_id: str, memory_data: Dict[str, Any]) -> List[Edge]:
+    """
+    Edges for a memory, whose graph node is its memory-store id.
+    """
+    edges = []
 
     # Create edges based on memory type
     if memory_data['type'] == 'interaction':
         prompt_id = hashlib.md5(memory_data['content']['prompt'].encode()).hexdigest()
         response_id = hashlib.md5(memory_data['content']['response'].encode()).hexdigest()
-        create_edge(memory_id, prompt_id, "CONTAINS_PROMPT", 1.0)
-        create_edge(memory_id, response_id, "CONTAINS_RESPONSE", 1.0)
+        edges.append((memory_id, prompt_id, "CONTAINS_PROMPT", 1.0))
+        edges.append((memory_id, response_id, "CONTAINS_RESPONSE", 1.0))
     elif memory_data['type'] == 'document_chunk':
         chunk_id = memory_data['chunk_id']
-        create_edge(memory_id, chunk_id, "CONTAINS_CHUNK", 1.0)
+        edges.append((memory_id, chunk_id, "CONTAINS_CHUNK", 1.0))
 
     # Create edges for metadata
-    create_edge(memory_id, memory_data['username'], "CREATED_BY", 1.0)
-    create_edge(memory_id, memory_data['model_name'], "USED_MODEL", 1.0)
+    edges.append((memory_id, memory_data['username'], "CREATED_BY", 1.0))
+    edges.append((memory_id, memory_data['model_name'], "USED_MODEL", 1.0))
+    return edges
 
-def get_related_memories(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+def get_related_memories(query: str, top_k: int = 5, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Retrieve related memories from the edge-based knowledge graph.
+    Retrieve related memories from the edge-based knowledge graph, up to two
+    hops from the query, nearest and strongest first. Memory nodes are looked
+    up in the user's partition, then the shared one; other nodes (prompts,
+    responses, usernames, models) are skipped.
     """
     query_id = hashlib.md5(query.encode()).hexdigest()
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # This is a simplified query. In a more advanced implementation,
-    # you might want to use more sophisticated graph traversal algorithms.
-    cursor.execute("""
-        SELECT e.target_id, e.relationship_type, e.strength
-        FROM edges e
-        WHERE e.source_id = ?
-        ORDER BY e.strength DESC
-        LIMIT ?
-    """, (query_id, top_k))
-
-    related_nodes = cursor.fetchall()
-    conn.close()
+    result = traverse([query_id], max_depth=2)
+    related_nodes = [node for node in result["nodes"] if node["node_id"] != query_id]
 
     related_memories = []
-    for node_id, relationship_type, strength in related_nodes:
-        memory_data = read_json_file(DATA_DIR / f"{node_id}.json")
-        related_memories.append({
-            "content": memory_data.get("content", ""),
-            "type": memory_data.get("type", "unknown"),
-            "relationship": relationship_type,
-            "strength": strength
-        })
-
-    return related_memories
\ No newline at end of file
+    with partitions.use(user_id) as partition:
+        for node in related_nodes:
+            if len(related_memories) >= top_k:
+                break
+            memory_data = partition.memory_store.get(node["node_id"])
+            if memory_data is None and partition is not partitions.shared:
+                memory_data = partitions.shared.memory_store.get(node["node_id"])
+            if memory_data is None:
+                continue
+            related_memories.append({
+                "content": memory_data.get("content", ""),
+                "type": memory_data.get("type", "unknown"),
+                "relationship": node["relationship"],
+                "strength": node["score"],
+                "depth": node["depth"]
+            })
+
+    return related_memories
+
+write_queue = WriteBehindQueue(save_queued_writes, WRITE_BEHIND_JOURNAL or None, WRITE_BEHIND_MAX_BUFFER,
+                               WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_ENABLED,
+                               WRITE_BEHIND_PUT_TIMEOUT)
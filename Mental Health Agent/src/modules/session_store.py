@@ -0,0 +1,96 @@
+# src/modules/session_store.py
+
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from config import MAX_CONVERSATION_SESSIONS, SESSION_IDLE_SECONDS, SESSION_MAX_CONTEXT_TOKENS
+from .caching import LRUCache
+from .logging_setup import logger
+
+DEFAULT_SESSION = "_default"
+
+class ConversationSession:
+    """
+    Ollama's returned ``context`` token state for one user's conversation.
+
+    Passing it back with the next request lets Ollama continue from the
+    conversation so far, so only the new turn needs prefill.
+    """
+
+    def __init__(self, key: str, model: str):
+        self.key = key
+        self.model = model
+        self.context: List[int] = []
+        self.turns = 0
+        self.lock = threading.Lock()
+
+    async def acquire_async(self, poll_interval: float = 0.01):
+        """
+        Take ``lock`` from a coroutine without blocking the event loop. Polling
+        keeps a cancelled waiter from taking the lock after it has given up.
+        """
+        while not self.lock.acquire(blocking=False):
+            await asyncio.sleep(poll_interval)
+
+    def update(self, context: Optional[List[int]]):
+        self.context = list(context or [])
+        self.turns += 1
+
+    def reset(self):
+        self.context = []
+        self.turns = 0
+
+class SessionStore:
+    """
+    Conversation sessions keyed by user id, evicted when idle or when the
+    store is over capacity. A session is restarted (the system prompt is
+    prefilled again) when its context outgrows the model's window.
+    """
+
+    def __init__(self, max_sessions: int = 256, idle_seconds: float = 1800, max_context_tokens: int = 1800):
+        self.max_context_tokens = max_context_tokens
+        self._sessions = LRUCache(max_sessions, ttl=idle_seconds)
+        self._lock = threading.Lock()
+        self.restarts = 0
+
+    @staticmethod
+    def key(user_id: Any) -> str:
+        return DEFAULT_SESSION if user_id is None else str(user_id)
+
+    def get(self, user_id: Any, model: str) -> ConversationSession:
+        key = self.key(user_id)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or session.model != model:
+                session = ConversationSession(key, model)
+            # Setting it again refreshes the idle timeout
+            self._sessions.set(key, session)
+        return session
+
+    def prompt_for(self, session: ConversationSession, system_prompt: str, turn_prompt: str, history: str = "") -> str:
+        """
+        The text to send for this turn: only the turn itself when the session
+        carries context, otherwise the system prompt, the recent history (which
+        the session's context tokens would otherwise hold) and the turn.
+        """
+        if len(session.context) > self.max_context_tokens:
+            logger.info(f"Restarting conversation session {session.key} after {session.turns} turns "
+                        f"({len(session.context)} context tokens)")
+            session.reset()
+            self.restarts += 1
+        if session.context:
+            return turn_prompt
+        return "\n\n".join(part for part in (system_prompt, history, turn_prompt) if part)
+
+    def reset(self, user_id: Any):
+        self._sessions.pop(self.key(user_id))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._sessions.stats()
+        return {
+            "sessions": stats["size"],
+            "evictions": stats["evictions"],
+            "restarts": self.restarts,
+        }
+
+conversation_sessions = SessionStore(MAX_CONVERSATION_SESSIONS, SESSION_IDLE_SECONDS, SESSION_MAX_CONTEXT_TOKENS)
@@ -0,0 +1,27 @@
+# src/modules/stage_timing.py
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Optional
+
+# The Turn being handled on this thread, so code deep in a turn (memory search,
+# persistence) can report its time without the turn being passed down to it.
+_local = threading.local()
+
+def current_turn() -> Optional[Any]:
+    return getattr(_local, "turn", None)
+
+def bind_turn(turn: Optional[Any]):
+    _local.turn = turn
+
+@contextmanager
+def timed(name: str):
+    """
+    Time the block as a stage of the current thread's turn; a no-op outside a turn.
+    """
+    turn = current_turn()
+    if turn is None:
+        yield
+        return
+    with turn.stage(name):
+        yield
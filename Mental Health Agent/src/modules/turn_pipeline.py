@@ -0,0 +1,183 @@
+# src/modules/turn_pipeline.py
+
+import time
+import hashlib
+import threading
+import itertools
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from config import (ADAPT_CONTEXT_MODE, TURN_LATENCY_BUDGET, ADAPT_MAX_CONCURRENT_TURNS,
+                    ADAPT_CACHE_SIZE, ADAPT_CACHE_TTL, FORMATTED_CONTEXT_MAX_CHARS)
+from .caching import LRUCache
+from .logging_setup import logger
+from .context_management import adapt_context_to_user, format_context
+from .stage_timing import bind_turn, current_turn
+
+class TurnStats:
+    """
+    Recent turn records, in-flight turn count and per-stage latency estimates
+    (exponentially weighted), which the adapt stage uses to decide its path.
+    """
+
+    def __init__(self, window: int = 256, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=window)
+        self._estimates: Dict[str, float] = {}
+        self._ids = itertools.count(1)
+        self.in_flight = 0
+
+    def begin(self) -> int:
+        with self._lock:
+            self.in_flight += 1
+            return next(self._ids)
+
+    def end(self, record: Dict[str, Any]):
+        with self._lock:
+            self.in_flight -= 1
+            self._records.append(record)
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            previous = self._estimates.get(stage)
+            self._estimates[stage] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+
+    def estimate(self, stage: str, default: float = 0.0) -> float:
+        with self._lock:
+            return self._estimates.get(stage, default)
+
+    def reset(self, window: Optional[int] = None):
+        """
+        Forget recorded turns and estimates, optionally keeping a different number of records.
+        """
+        with self._lock:
+            self._records = deque(maxlen=window or self._records.maxlen)
+            self._estimates.clear()
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records)
+
+    def summary(self) -> Dict[str, Any]:
+        records = self.recent()
+        totals = sorted(record["total_seconds"] for record in records)
+        return {
+            "turns": len(records),
+            "in_flight": self.in_flight,
+            "adapt_paths": dict(Counter(record["adapt_path"] for record in records)),
+            "over_budget": sum(1 for record in records if record["over_budget"]),
+            "total_p50_seconds": totals[len(totals) // 2] if totals else 0.0,
+            "estimates": dict(self._estimates),
+        }
+
+turn_stats = TurnStats()
+adapt_cache = LRUCache(ADAPT_CACHE_SIZE, ttl=ADAPT_CACHE_TTL)
+
+class Turn:
+    """
+    One agent turn with an explicit latency budget.
+
+    Stages are timed with ``stage()``, or with ``stage_timing.timed()`` by code
+    running on the turn's thread that has no reference to it. Context adaptation is optional: it is
+    served from cache when the gathered context has not changed, replaced by
+    the deterministic formatter when the server is busy or the LLM pass would
+    not fit in the remaining budget, and otherwise run through the LLM. The
+    chosen path is part of the turn record.
+    """
+
+    def __init__(self, user_id: Optional[str] = None, budget: float = TURN_LATENCY_BUDGET,
+                 adapt_mode: str = ADAPT_CONTEXT_MODE, stats: TurnStats = turn_stats):
+        self.user_id = user_id
+        self.budget = budget
+        self.adapt_mode = adapt_mode
+        self.stats = stats
+        self.turn_id = stats.begin()
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.adapt_path = "none"
+        self.adapt_reason = ""
+        self._finished = False
+        bind_turn(self)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def remaining(self) -> float:
+        return self.budget - self.elapsed()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self.stats.observe(name, seconds)
+
+    def _choose_adapt_path(self) -> Tuple[str, str]:
+        if self.adapt_mode == "skip":
+            return "skipped", "mode"
+        if self.adapt_mode == "format":
+            return "formatted", "mode"
+        if self.adapt_mode == "llm":
+            return "llm", "mode"
+        if self.stats.in_flight > ADAPT_MAX_CONCURRENT_TURNS:
+            return "formatted", "load"
+        # Leave room for the main generation, which cannot be skipped
+        needed = self.stats.estimate("adapt") + self.stats.estimate("generate")
+        if needed > self.remaining():
+            return "formatted", "budget"
+        return "llm", "budget"
+
+    def adapt_context(self, context: str, model_name: str) -> str:
+        """
+        Adapt the retrieved-memory context. Recent history is not passed in: it
+        changes every turn and would defeat the cache.
+        """
+        if not format_context(context):
+            self.adapt_path, self.adapt_reason = "skipped", "no memories"
+            return ""
+        key = hashlib.sha256(f"{model_name}\0{self.user_id}\0{context}".encode()).hexdigest()
+        cached = adapt_cache.get(key)
+        if cached is not None:
+            self.adapt_path, self.adapt_reason = "cached", "unchanged context"
+            return cached
+
+        self.adapt_path, self.adapt_reason = self._choose_adapt_path()
+        if self.adapt_path == "skipped":
+            return context
+        if self.adapt_path == "formatted":
+            with self.stage("format"):
+                return format_context(context, FORMATTED_CONTEXT_MAX_CHARS)
+
+        with self.stage("adapt"):
+            adapted = adapt_context_to_user(context, model_name, self.user_id)
+        # process_prompt reports failures as an "Error..." string instead of raising
+        if not adapted or adapted.startswith("Error"):
+            self.adapt_path, self.adapt_reason = "formatted", "llm error"
+            return format_context(context, FORMATTED_CONTEXT_MAX_CHARS)
+        adapt_cache.set(key, adapted)
+        return adapted
+
+    def finish(self) -> Dict[str, Any]:
+        total = self.elapsed()
+        record = {
+            "turn_id": self.turn_id,
+            "user_id": self.user_id,
+            "adapt_path": self.adapt_path,
+            "adapt_reason": self.adapt_reason,
+            "stages": dict(self.stages),
+            "total_seconds": total,
+            "budget_seconds": self.budget,
+            "over_budget": total > self.budget,
+        }
+        if not self._finished:
+            self._finished = True
+            if current_turn() is self:
+                bind_turn(None)
+            self.stats.end(record)
+            logger.info(f"Turn {self.turn_id} finished in {total:.2f}s (budget {self.budget:.1f}s), "
+                        f"adapt path: {self.adapt_path} ({self.adapt_reason})")
+        return record
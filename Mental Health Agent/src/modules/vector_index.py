@@ -0,0 +1,189 @@
+# src/modules/vector_index.py
+
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from .logging_setup import logger
+from .ann_index import IVFIndex, create_ann_index
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale vectors (a single vector or one per row) to unit length; zero vectors are left as zeros.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def top_k_scores(scores: np.ndarray, top_k: Optional[int] = None) -> List[Tuple[float, int]]:
+    """
+    Return (score, index) pairs for the highest scores, best first.
+    Uses argpartition so only the top_k candidates are sorted.
+    """
+    if top_k is not None and top_k < len(scores):
+        if top_k <= 0:
+            return []
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(len(scores))
+    ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return [(float(scores[i]), int(i)) for i in ranked]
+
+class VectorIndex:
+    """
+    Process-resident store of memory embeddings.
+
+    Vectors live in one contiguous float32 matrix; ``ids`` and ``metadata``
+    are parallel lists so row ``i`` of the matrix belongs to ``ids[i]``.
+    Rows are normalized on insert, so cosine similarity is a plain dot product.
+    An optional IVF index narrows each query to a candidate subset of rows.
+    """
+
+    def __init__(self, initial_capacity: int = 256, ann: Optional[IVFIndex] = None):
+        self.ann = ann
+        self._lock = threading.RLock()
+        self._initial_capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._positions: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._positions
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def add(self, memory_id: str, vector: List[float], metadata: Dict[str, Any] = None) -> bool:
+        """
+        Append a vector, or overwrite the row if the id is already indexed.
+        """
+        row = np.asarray(vector, dtype=np.float32)
+        if row.ndim != 1 or row.size == 0:
+            logger.warning(f"Skipping invalid embedding for memory: {memory_id}")
+            return False
+        row = normalize(row)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((self._initial_capacity, row.size), dtype=np.float32)
+            elif row.size != self._matrix.shape[1]:
+                logger.warning(f"Skipping embedding for {memory_id}: dimension {row.size} != {self._matrix.shape[1]}")
+                return False
+
+            position = self._positions.get(memory_id)
+            if position is None:
+                if self._size == self._matrix.shape[0]:
+                    self._grow()
+                position = self._size
+                self._size += 1
+                self._positions[memory_id] = position
+                self.ids.append(memory_id)
+                self.metadata.append(metadata or {})
+            else:
+                self.metadata[position] = metadata or {}
+            self._matrix[position] = row
+            self._update_ann(position, row)
+            return True
+
+    def _update_ann(self, position: int, row: np.ndarray):
+        if self.ann is None:
+            return
+        if self.ann.trained and self.ann.centroids.shape[1] != row.size:
+            logger.warning("IVF centroids do not match the embedding dimension; retraining")
+            self.ann.centroids = None
+        if self.ann.needs_training(self._size):
+            self.ann.train(self._matrix[:self._size])
+            self.ann.rebuild(self._matrix[:self._size])
+        else:
+            self.ann.add(position, row)
+
+    def _grow(self):
+        grown = np.empty((self._matrix.shape[0] * 2, self._matrix.shape[1]), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+        logger.debug(f"Grew vector index capacity to {grown.shape[0]} rows")
+
+    def snapshot(self) -> Tuple[np.ndarray, List[str], List[Dict[str, Any]]]:
+        """
+        Return a consistent (matrix, ids, metadata) view for scoring.
+        """
+        with self._lock:
+            if self._matrix is None:
+                return np.empty((0, 0), dtype=np.float32), [], []
+            return self._matrix[:self._size], list(self.ids), list(self.metadata)
+
+    def get_metadata(self, memory_id: str) -> Dict[str, Any]:
+        with self._lock:
+            position = self._positions.get(memory_id)
+            return {} if position is None else self.metadata[position]
+
+    def search(self, query: List[float], top_k: int) -> List[Tuple[float, str]]:
+        return self.search_batch([query], top_k)[0]
+
+    def search_batch(self, queries: List[List[float]], top_k: int) -> List[List[Tuple[float, str]]]:
+        """
+        Score every query against the index with one matrix product.
+        Returns (similarity, memory_id) pairs per query, best first.
+        """
+        matrix, ids, _ = self.snapshot()
+        if not ids or not len(queries):
+            return [[] for _ in queries]
+        query_matrix = normalize(np.asarray(queries, dtype=np.float32).reshape(len(queries), -1))
+        if query_matrix.shape[1] != matrix.shape[1]:
+            logger.error(f"Query dimension {query_matrix.shape[1]} does not match index dimension {matrix.shape[1]}")
+            return [[] for _ in queries]
+        if self.ann is not None and self.ann.trained:
+            return [self._search_ann(query, matrix, ids, top_k) for query in query_matrix]
+        scores = query_matrix @ matrix.T
+        return [[(score, ids[i]) for score, i in top_k_scores(row, top_k)] for row in scores]
+
+    def similarities(self, query: List[float], memory_ids: List[str]) -> Dict[str, float]:
+        """
+        Cosine similarity of the query to each of the given memories that is indexed.
+        """
+        with self._lock:
+            if self._matrix is None:
+                return {}
+            known = [memory_id for memory_id in memory_ids if memory_id in self._positions]
+            rows = self._matrix[[self._positions[memory_id] for memory_id in known]]
+        query = normalize(np.asarray(query, dtype=np.float32))
+        if not known or query.shape[0] != rows.shape[1]:
+            return {}
+        return dict(zip(known, (rows @ query).tolist()))
+
+    def _search_ann(self, query: np.ndarray, matrix: np.ndarray, ids: List[str], top_k: int) -> List[Tuple[float, str]]:
+        with self._lock:
+            candidates = self.ann.candidates(query)
+        candidates = candidates[candidates < len(ids)]
+        scores = matrix[candidates] @ query
+        return [(score, ids[candidates[i]]) for score, i in top_k_scores(scores, top_k)]
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._size = 0
+            self._positions = {}
+            self.ids = []
+            self.metadata = []
+            self.loaded = False
+            if self.ann is not None:
+                self.ann.reset()
+
+def memory_metadata(memory_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The subset of a memory entry kept alongside its vector.
+    """
+    return {
+        "content": memory_data.get("content", ""),
+        "type": memory_data.get("type", "unknown"),
+        "timestamp": memory_data.get("timestamp", ""),
+        "permanent_marker": memory_data.get("permanent_marker", 0),
+        "access_count": memory_data.get("access_count", 0),
+    }
+
+memory_index = VectorIndex(ann=create_ann_index())
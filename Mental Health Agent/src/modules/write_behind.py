@@ -0,0 +1,259 @@
+# src/modules/write_behind.py
+
+import json
+import atexit
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from .logging_setup import logger
+
+class WriteBehindQueue:
+    """
+    Accepts writes immediately and applies them in batches on a background thread.
+
+    Every accepted item is first appended to a journal file, so items that have
+    not been written yet survive a crash and are replayed on the next start
+    (writes are at-least-once). At most ``max_buffer`` items are kept in memory;
+    past that they live only in the journal until the worker reads them back.
+
+    The journal is what makes the queue durable and unbounded. Without one,
+    items are lost on a crash, and a full buffer applies backpressure: the
+    caller waits up to ``put_timeout`` seconds for room, then the item is
+    dropped and counted. A disabled queue writes synchronously on the caller's
+    path, as persistence did before the queue existed.
+
+    ``stop()`` drains the queue; whatever does not make it stays in the journal.
+    Items the writer reports as failed go to a ``.failed`` file next to it.
+    """
+
+    def __init__(self, writer: Callable[[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]],
+                 journal_path: Optional[Path] = None, max_buffer: int = 1000, batch_size: int = 32,
+                 flush_interval: float = 0.5, enabled: bool = True, put_timeout: float = 1.0):
+        self.writer = writer
+        self.journal_path = Path(journal_path) if journal_path else None
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.put_timeout = put_timeout
+        self._buffer: List[Dict[str, Any]] = []
+        # Items accepted since the journal was last rotated that are only in the journal
+        self._overflowed = 0
+        self._journal = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._space = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.overflowed = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.replayed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def flushing_path(self) -> Optional[Path]:
+        return self.journal_path.with_suffix(".flushing") if self.journal_path else None
+
+    @property
+    def replay_path(self) -> Optional[Path]:
+        return self.journal_path.with_suffix(".replay") if self.journal_path else None
+
+    @property
+    def failed_path(self) -> Optional[Path]:
+        return self.journal_path.with_suffix(".failed") if self.journal_path else None
+
+    def start(self):
+        if self.running or not self.enabled:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._set_aside_journal()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+        if self.journal_path is None:
+            logger.warning("Write-behind queue has no journal: queued writes are lost on a crash "
+                           "and dropped when the buffer stays full")
+        logger.info("Started write-behind persistence queue")
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop accepting background work and drain what is queued, waiting up to timeout seconds.
+        """
+        self._stop.set()
+        with self._wake:
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f"Write-behind queue did not drain within {timeout}s; "
+                               f"pending writes stay in {self.journal_path}")
+
+    def submit(self, item: Dict[str, Any]):
+        if not self.enabled:
+            self._write([item])
+            return
+        self.start()
+        with self._lock:
+            self.submitted += 1
+            if self.journal_path is not None:
+                self._journal_file().write(json.dumps(item) + "\n")
+                self._journal.flush()
+            if len(self._buffer) >= self.max_buffer:
+                self.overflowed += 1
+                if self.journal_path is not None:
+                    self._overflowed += 1
+                elif not self._wait_for_space():
+                    self.dropped += 1
+                    logger.error(f"Write-behind buffer stayed full for {self.put_timeout:g}s, "
+                                 f"dropped a {item.get('kind', 'queued')} write ({self.dropped} dropped so far)")
+                    return
+            if len(self._buffer) < self.max_buffer:
+                self._buffer.append(item)
+            if len(self._buffer) + self._overflowed >= self.batch_size:
+                self._wake.notify()
+
+    def _wait_for_space(self) -> bool:
+        """
+        Backpressure without a journal, called with the lock held: wait until
+        the worker takes the buffer or put_timeout runs out.
+        """
+        self.throttled += 1
+        self._wake.notify()
+        return self._space.wait_for(lambda: len(self._buffer) < self.max_buffer, self.put_timeout)
+
+    def flush(self):
+        """
+        Write everything accepted so far before returning.
+        """
+        with self._flush_lock:
+            items = self._take()
+            if items:
+                self._write(items)
+                self._finish_flushing()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer) + self._overflowed
+
+    def _journal_file(self):
+        if self._journal is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return self._journal
+
+    def _set_aside_journal(self):
+        # Files left by an earlier run are replayed by the worker; new writes start a fresh journal
+        if self.journal_path is None or self._journal is not None:
+            return
+        for path in (self.flushing_path, self.journal_path):
+            if not path.exists():
+                continue
+            if self.replay_path.exists():
+                with open(self.replay_path, "a", encoding="utf-8") as f:
+                    # Start on a new line in case the file ends with a line cut short by a crash
+                    f.write("\n" + path.read_text(encoding="utf-8"))
+                path.unlink()
+            else:
+                path.replace(self.replay_path)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        """
+        Hand over everything pending; the journal holding it becomes the flushing file.
+        """
+        with self._lock:
+            items, self._buffer = self._buffer, []
+            overflowed, self._overflowed = self._overflowed, 0
+            self._space.notify_all()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+                self.journal_path.replace(self.flushing_path)
+        if overflowed:
+            # Part of the items never made it into memory; the journal has all of them, in order
+            items = self._read(self.flushing_path)
+        return items
+
+    def _finish_flushing(self):
+        if self.flushing_path is not None:
+            self.flushing_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _read(path: Path) -> List[Dict[str, Any]]:
+        items = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut short by a crash
+                    logger.warning(f"Skipping unreadable line in {path}")
+        return items
+
+    def _replay(self):
+        """
+        Write out items left behind by a crash or by a shutdown that could not drain.
+        """
+        if self.replay_path is None or not self.replay_path.exists():
+            return
+        with self._flush_lock:
+            items = self._read(self.replay_path)
+            logger.info(f"Replaying {len(items)} writes left in {self.replay_path}")
+            self.replayed += len(items)
+            self._write(items)
+            self.replay_path.unlink()
+
+    def _write(self, items: List[Dict[str, Any]]):
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            try:
+                failed = self.writer(batch) or []
+            except Exception as e:
+                logger.error(f"Error writing a batch of {len(batch)} queued writes: {str(e)}")
+                failed = batch
+            self.batches += 1
+            self.written += len(batch) - len(failed)
+            self.failed += len(failed)
+            if failed and self.failed_path is not None:
+                with open(self.failed_path, "a", encoding="utf-8") as f:
+                    for item in failed:
+                        f.write(json.dumps(item) + "\n")
+
+    def _run(self):
+        self._replay()
+        while True:
+            with self._wake:
+                if not self._stop.is_set() and len(self._buffer) + self._overflowed < self.batch_size:
+                    self._wake.wait(self.flush_interval)
+                stopping = self._stop.is_set()
+            self.flush()
+            if stopping and not self.pending():
+                break
+        logger.info(f"Write-behind queue stopped after writing {self.written} items")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending": self.pending(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "overflowed": self.overflowed,
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "replayed": self.replayed,
+        }